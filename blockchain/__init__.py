@@ -3,5 +3,6 @@ from .blockchain import Blockchain
 from .wallet import Wallet
 from .transaction import Transaction
 from .p2p import P2PServer
+from .storage import ChainStore, BlockLogError
 
-__all__ = ['Block', 'Blockchain', 'Wallet', 'Transaction', 'P2PServer']
\ No newline at end of file
+__all__ = ['Block', 'Blockchain', 'Wallet', 'Transaction', 'P2PServer', 'ChainStore', 'BlockLogError']
\ No newline at end of file
@@ -0,0 +1,22 @@
+import hashlib
+import struct
+
+# hashlib is backed by OpenSSL, which already dispatches to SHA-NI / ARMv8
+# SHA2 instructions at runtime; bind the constructor once for the hot paths.
+_sha256 = hashlib.sha256
+
+# Two concatenated 32-byte child digests in a Merkle layer
+PAIR_STRUCT = struct.Struct('64s')
+
+def sha256(data):
+    """Return the raw 32-byte SHA-256 digest of data"""
+    return _sha256(data).digest()
+
+def sha256_many(items):
+    """Hash many byte strings, returning their digests joined into one buffer"""
+    return b''.join([_sha256(item).digest() for item in items])
+
+def hash_layer(layer):
+    """Hash a contiguous buffer of 64-byte sibling pairs into their 32-byte parents"""
+    # iter_unpack splits the buffer into pairs in C, leaving one hash call per node
+    return sha256_many([pair for (pair,) in PAIR_STRUCT.iter_unpack(layer)])
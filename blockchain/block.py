@@ -1,37 +1,255 @@
+import os
 import time
 import hashlib
 import json
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from ._hash import sha256, hash_layer
+
+# Proof-of-work header hashes; BLAKE2b is truncated to 32 bytes so hashes keep
+# the same size and hex layout as SHA-256
+HASH_ALGORITHMS = {
+    "sha256": hashlib.sha256,
+    "blake2b": partial(hashlib.blake2b, digest_size=32),
+}
+
+# Block header formats: version 1 blocks hash their JSON-serialized fields,
+# version 2 blocks hash the binary header below. Blocks saved without a
+# version predate the binary header and are version 1.
+LEGACY_BLOCK_VERSION = 1
+BLOCK_VERSION = 2
+
+# Binary header layout: index, previous hash, timestamp, data root, then the
+# nonce last so the constant part can be absorbed once while mining
+HEADER_STRUCT = struct.Struct('>I32sd32s')
+NONCE_STRUCT = struct.Struct('>Q')
+
+# Number of nonces tried per mine_batch call
+MINING_BATCH_SIZE = 1 << 14
+
+def _hash_bytes(value):
+    """Return the raw 32 bytes of a hex digest (other strings are hashed to 32 bytes)"""
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        raw = b''
+    if len(raw) != 32:
+        raw = sha256(value.encode())
+    return raw
+
+def merkle_leaf(tx):
+    """Return the raw 32-byte Merkle leaf for a transaction or a precomputed digest"""
+    if isinstance(tx, bytes) and len(tx) == 32:
+        return tx  # Already a raw digest
+    if isinstance(tx, str) and len(tx) == 64:
+        return _hash_bytes(tx)  # Assuming it's already a hash
+    if hasattr(tx, "calculate_hash"):
+        # Transaction objects hash their own content; a claimed id is never
+        # trusted since the root has to commit to what the block contains
+        return bytes.fromhex(tx.calculate_hash())
+    return sha256(json.dumps(tx, sort_keys=True).encode())
+
+def merkle_leaves(transactions):
+    """Convert transactions to raw 32-byte leaf digests in one contiguous buffer"""
+    return b''.join([merkle_leaf(tx) for tx in transactions])
+
+def build_merkle_root(layer):
+    """Reduce a buffer of leaf digests to the raw 32-byte Merkle root"""
+    # Build the Merkle tree one layer at a time
+    while len(layer) > 32:
+        if len(layer) % 64:
+            layer += layer[-32:]  # Duplicate the last hash if odd number
+        layer = hash_layer(layer)
+    return layer
+
+@lru_cache(maxsize=None)
+def difficulty_target(difficulty):
+    """Return the bound a raw digest must compare below to start with `difficulty` zero hex digits"""
+    if difficulty <= 0:
+        return b'\xff' * 33  # Every 32-byte digest compares below this
+    return (1 << (256 - 4 * difficulty)).to_bytes(32, 'big')
+
+def mine_batch(midstate, nonce_start, count, difficulty):
+    """Search nonces in [nonce_start, nonce_start + count) against a header midstate.
+    
+    Returns a (nonce, hash) tuple for the first hash meeting the difficulty,
+    or None if no nonce in the range does.
+    """
+    # Big-endian digests order like integers, so one bytes comparison checks
+    # every leading nibble; only the winning digest is hex-encoded
+    target = difficulty_target(difficulty)
+    copy = midstate.copy
+    pack_nonce = NONCE_STRUCT.pack
+    for nonce in range(nonce_start, nonce_start + count):
+        ctx = copy()
+        ctx.update(pack_nonce(nonce))
+        digest = ctx.digest()
+        if digest < target:
+            return nonce, digest.hex()
+    return None
+
+def _mine_range(prefix, nonce_start, count, difficulty, hash_alg):
+    """Worker entry point: hashlib objects do not pickle, so rebuild the midstate"""
+    return mine_batch(HASH_ALGORITHMS[hash_alg](prefix), nonce_start, count, difficulty)
+
+def mine_parallel(prefix, nonce_start, difficulty, workers=None, hash_alg="sha256"):
+    """Search nonces from nonce_start across worker processes.
+    
+    Batches are handed out and collected in nonce order, so the result is
+    the same (nonce, hash) a serial search would find.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_start = nonce_start
+        while True:
+            # Keep every worker busy with the next batches in line
+            while len(pending) < 2 * workers:
+                pending.append(pool.submit(
+                    _mine_range, prefix, next_start, MINING_BATCH_SIZE, difficulty, hash_alg
+                ))
+                next_start += MINING_BATCH_SIZE
+            
+            found = pending.popleft().result()
+            if found:
+                for future in pending:
+                    future.cancel()
+                return found
+
+class _HeaderField:
+    """Block attribute the header hash commits to; assigning it marks the stored hash unverified"""
+    
+    def __set_name__(self, owner, name):
+        self.name = "_" + name
+    
+    def __get__(self, block, owner=None):
+        if block is None:
+            return self
+        return block.__dict__[self.name]
+    
+    def __set__(self, block, value):
+        block.__dict__[self.name] = value
+        block._dirty = True
 
 class Block:
-    def __init__(self, index, previous_hash, timestamp, data, nonce=0):
+    version = _HeaderField()
+    index = _HeaderField()
+    previous_hash = _HeaderField()
+    timestamp = _HeaderField()
+    nonce = _HeaderField()
+    hash_alg = _HeaderField()
+    hash = _HeaderField()
+    
+    def __init__(self, index, previous_hash, timestamp, data, nonce=0, hash_alg="sha256", version=BLOCK_VERSION):
+        if hash_alg not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_alg}")
+        if version not in (LEGACY_BLOCK_VERSION, BLOCK_VERSION):
+            raise ValueError(f"Unsupported block version: {version}")
+        
+        self.version = version
         self.index = index
         self.previous_hash = previous_hash
         self.timestamp = timestamp
-        self.data = data
         self.nonce = nonce
-        self.hash = self.calculate_hash()
+        self.hash_alg = hash_alg
         self.contract_results = {}  # Store results of smart contract executions
         self.signatures = {}  # For PoS and other signature-based consensus
         self.merkle_root = None  # For efficient transaction verification
+        self.data = data  # Also computes the Merkle root
+        self.hash = self.calculate_hash()
+        self._dirty = False  # Set when a header field or the data changes after hashing
     
-    def calculate_hash(self):
-        """Calculate the hash of the block"""
-        block_string = json.dumps({
+    @property
+    def data(self):
+        return self._data
+    
+    @data.setter
+    def data(self, value):
+        self._data = value
+        
+        # The header commits to the data, so refresh the Merkle root and data
+        # digest, and mark the stored hash as stale
+        self.calculate_merkle_root()
+    
+    def _data_root(self):
+        """Return the 32-byte commitment to the block data used in the header"""
+        # Blocks carrying only transactions commit to their Merkle root, so the
+        # header stays fixed-size regardless of the transaction count
+        if self.merkle_root and self._data.keys() == {"transactions"}:
+            return bytes.fromhex(self.merkle_root)
+        
+        # Other data is serialized once and the digest reused on every rehash;
+        # calculate_merkle_root() refreshes it after in-place changes
+        if self._data_digest is None:
+            self._data_digest = sha256(json.dumps(self._data, sort_keys=True).encode())
+        return self._data_digest
+    
+    def _legacy_header(self):
+        """Serialize the header of a version 1 block, which commits to the full data as JSON"""
+        return json.dumps({
             "index": self.index,
             "previous_hash": self.previous_hash,
             "timestamp": self.timestamp,
-            "data": self.data,
+            "data": self._data,
             "nonce": self.nonce
         }, sort_keys=True).encode()
+    
+    def _header_prefix(self):
+        """Pack the header fields that precede the nonce"""
+        return HEADER_STRUCT.pack(
+            self.index,
+            _hash_bytes(self.previous_hash),
+            self.timestamp,
+            self._data_root()
+        )
+    
+    def calculate_hash(self):
+        """Calculate the hash of the block"""
+        hasher = HASH_ALGORITHMS[self.hash_alg]
+        if self.version == LEGACY_BLOCK_VERSION:
+            return hasher(self._legacy_header()).hexdigest()
+        return hasher(self._header_prefix() + NONCE_STRUCT.pack(self.nonce)).hexdigest()
+    
+    def verify_hash(self):
+        """Check the stored hash against the header and data as they are now"""
+        # Rebuild the data commitment too, since the data may have been edited
+        # in place without going through the setter
+        self.calculate_merkle_root()
+        if self.hash != self.calculate_hash():
+            return False
+        self._dirty = False
+        return True
+    
+    def meets_difficulty(self, difficulty):
+        """Check whether the stored hash starts with `difficulty` zero hex digits"""
+        try:
+            digest = bytes.fromhex(self.hash)
+        except (TypeError, ValueError):
+            return False
+        return len(digest) == 32 and digest < difficulty_target(difficulty)
+    
+    def mine_block(self, difficulty, workers=1):
+        """Mine a block with the given difficulty, optionally across worker processes"""
+        # Mining always produces a current-format header
+        self.version = BLOCK_VERSION
+        prefix = self._header_prefix()
         
-        return hashlib.sha256(block_string).hexdigest()
-    
-    def mine_block(self, difficulty):
-        """Mine a block with the given difficulty"""
-        target = '0' * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        if workers != 1:
+            found = mine_parallel(prefix, self.nonce, difficulty, workers, self.hash_alg)
+        else:
+            # Absorb the constant prefix once; each nonce only hashes its 8 bytes
+            midstate = HASH_ALGORITHMS[self.hash_alg](prefix)
+            nonce = self.nonce
+            while True:
+                found = mine_batch(midstate, nonce, MINING_BATCH_SIZE, difficulty)
+                if found:
+                    break
+                nonce += MINING_BATCH_SIZE
+        
+        self.nonce, self.hash = found
+        self._dirty = False
         return self
     
     def to_dict(self):
@@ -42,10 +260,13 @@ class Block:
             "timestamp": self.timestamp,
             "data": self.data,
             "nonce": self.nonce,
-            "hash": self.hash
+            "hash": self.hash,
+            "version": self.version
         }
         
         # Add optional fields if they exist
+        if self.hash_alg != "sha256":
+            block_dict["hash_alg"] = self.hash_alg
         if self.contract_results:
             block_dict["contract_results"] = self.contract_results
         if self.signatures:
@@ -66,6 +287,10 @@ class Block:
     
     def calculate_merkle_root(self):
         """Calculate the Merkle root of transactions in the block"""
+        # Data may have changed in place, and the header commits to it
+        self._data_digest = None
+        self.merkle_root = None
+        self._dirty = True
         if "transactions" not in self.data:
             return None
             
@@ -73,29 +298,7 @@ class Block:
         if not transactions:
             return None
             
-        # Convert transactions to hashes if they're not already
-        tx_hashes = []
-        for tx in transactions:
-            if isinstance(tx, str) and len(tx) == 64:  # Assuming it's already a hash
-                tx_hashes.append(tx)
-            else:
-                # Convert to JSON and hash
-                tx_json = json.dumps(tx, sort_keys=True).encode()
-                tx_hashes.append(hashlib.sha256(tx_json).hexdigest())
-        
-        # Build the Merkle tree
-        while len(tx_hashes) > 1:
-            if len(tx_hashes) % 2 != 0:
-                tx_hashes.append(tx_hashes[-1])  # Duplicate the last hash if odd number
-            
-            next_level = []
-            for i in range(0, len(tx_hashes), 2):
-                combined = tx_hashes[i] + tx_hashes[i+1]
-                next_level.append(hashlib.sha256(combined.encode()).hexdigest())
-            
-            tx_hashes = next_level
-        
-        self.merkle_root = tx_hashes[0]
+        self.merkle_root = build_merkle_root(merkle_leaves(transactions)).hex()
         return self.merkle_root
     
     def execute_smart_contracts(self, contract_engine):
@@ -142,16 +345,17 @@ class Block:
             block_dict["previous_hash"],
             block_dict["timestamp"],
             block_dict["data"],
-            block_dict["nonce"]
+            block_dict["nonce"],
+            block_dict.get("hash_alg", "sha256"),
+            block_dict.get("version", LEGACY_BLOCK_VERSION)
         )
-        block.hash = block_dict["hash"]
+        block.hash = block_dict["hash"]  # Unverified until verify_hash()
         
         # Add optional fields if they exist in the dictionary
         if "contract_results" in block_dict:
             block.contract_results = block_dict["contract_results"]
         if "signatures" in block_dict:
             block.signatures = block_dict["signatures"]
-        if "merkle_root" in block_dict:
-            block.merkle_root = block_dict["merkle_root"]
+        # The Merkle root is recomputed from the data rather than trusted
             
         return block
\ No newline at end of file
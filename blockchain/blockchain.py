@@ -3,17 +3,23 @@ from .utxo import UTXOSet, UTXO
 from .transaction import Transaction
 from .smart_contract import SmartContractEngine
 from .consensus import ProofOfWork, ProofOfStake, DelegatedProofOfStake
+from . import codec
 import time
-import json
 
 class Blockchain:
-    def __init__(self, consensus_type="pow", difficulty=4):
+    def __init__(self, consensus_type="pow", difficulty=4, hash_algorithm="sha256", create_genesis=True):
         self.chain = []
         self.difficulty = difficulty
+        self.hash_algorithm = hash_algorithm  # Block header hash, recorded in genesis
         self.pending_transactions = []
         self.mining_reward = 100
+        self.mining_workers = 1  # Processes used to search nonces (None = all cores)
         self.utxo_set = UTXOSet()
         self.contract_engine = SmartContractEngine(self)
+        self._applied_blocks = set()  # Hashes of blocks already applied to the UTXO set
+        self._verified_tx_hashes = set()  # Transactions whose signatures were already checked
+        self._last_validated_index = 0  # Chain prefix already checked by is_chain_valid
+        self._last_validated_hash = None
         
         # Initialize consensus mechanism
         self.consensus_type = consensus_type
@@ -26,13 +32,16 @@ class Blockchain:
         else:
             raise ValueError(f"Unsupported consensus type: {consensus_type}")
         
-        self.create_genesis_block()
+        # Chains restored from storage bring their own genesis block
+        if create_genesis:
+            self.create_genesis_block()
     
     def create_genesis_block(self):
         genesis_block = Block(0, "0", time.time(), {
             "transactions": [],
-            "message": "Genesis Block"
-        })
+            "message": "Genesis Block",
+            "hash_algorithm": self.hash_algorithm
+        }, hash_alg=self.hash_algorithm)
         
         # For PoW, mine the genesis block
         if self.consensus_type == "pow":
@@ -42,7 +51,9 @@ class Blockchain:
             genesis_block.hash = genesis_block.calculate_hash()
         
         self.chain.append(genesis_block)
-        
+        self._create_genesis_utxo()
+    
+    def _create_genesis_utxo(self):
         # Create initial coin distribution in genesis block
         genesis_tx = Transaction.create_coinbase(1000000, "GENESIS_ADDRESS")
         
@@ -55,11 +66,11 @@ class Blockchain:
     
     def add_transaction(self, transaction):
         # Validate the transaction
-        if not transaction.is_valid(self.utxo_set, self.get_public_key):
+        if not self._validate_transaction(transaction):
             return False
         
-        # Add to pending transactions
-        self.pending_transactions.append(transaction)
+        # Add to pending transactions in serialized form
+        self.pending_transactions.append(transaction.to_dict())
         return True
     
     def get_public_key(self, address):
@@ -67,13 +78,32 @@ class Blockchain:
         # This is a placeholder - would need to be implemented with a proper key store
         return None
     
+    def _validate_transaction(self, tx):
+        """Validate a transaction, skipping signature checks already done for its content"""
+        tx_hash = tx.calculate_hash()
+        if tx_hash in self._verified_tx_hashes:
+            # Only the inputs can have changed state since the full check
+            for tx_input in tx.inputs:
+                utxo = self.utxo_set.get_utxo(tx_input.tx_id, tx_input.output_index)
+                if not utxo or utxo.is_spent:
+                    return False
+            return True
+        
+        if not tx.is_valid(self.utxo_set, self.get_public_key):
+            return False
+        
+        self._verified_tx_hashes.add(tx_hash)
+        return True
+    
     def process_block_transactions(self, block):
         if "transactions" not in block.data:
             return True
         
         for tx_data in block.data["transactions"]:
-            # Convert dict to Transaction object if needed
-            tx = tx_data if isinstance(tx_data, Transaction) else Transaction.from_dict(tx_data)
+            # Legacy account-style transfers carry no UTXO inputs or outputs
+            if "type" not in tx_data:
+                continue
+            tx = Transaction.from_dict(tx_data)
             
             # Skip validation for coinbase transactions
             if tx.type == "coinbase":
@@ -84,7 +114,7 @@ class Blockchain:
                 continue
             
             # Validate the transaction
-            if not tx.is_valid(self.utxo_set, self.get_public_key):
+            if not self._validate_transaction(tx):
                 return False
             
             # Mark inputs as spent
@@ -119,10 +149,9 @@ class Blockchain:
         # Create a coinbase transaction for the mining reward
         coinbase_tx = Transaction.create_coinbase(self.mining_reward, miner_address)
         
-        # Add the coinbase transaction to the beginning of the block
-        block_transactions = [coinbase_tx]
-        
-        # Add pending transactions
+        # Add the coinbase transaction to the beginning of the block, followed
+        # by the pending transactions (already in dict form, so no extra pass)
+        block_transactions = [coinbase_tx.to_dict()]
         block_transactions.extend(self.pending_transactions)
         
         # Create a new block
@@ -131,14 +160,15 @@ class Blockchain:
             self.get_latest_block().hash,
             time.time(),
             {
-                "transactions": [tx.to_dict() for tx in block_transactions],
-            }
+                "transactions": block_transactions,
+            },
+            hash_alg=self.hash_algorithm
         )
         
         # Use the appropriate consensus mechanism to create/validate the block
         if self.consensus_type == "pow":
             # Mine the block with proof of work
-            block.mine_block(self.difficulty)
+            block.mine_block(self.difficulty, self.mining_workers)
         elif self.consensus_type == "pos":
             # For PoS, the miner must be a validator
             if not self.consensus.validate_block(block, miner_address):
@@ -159,9 +189,10 @@ class Blockchain:
         
         # Add the block to the chain
         self.chain.append(block)
+        self._applied_blocks.add(block.hash)
         
-        # Clear the pending transactions
-        self.pending_transactions = []
+        # Clear the pending transactions, keeping the list's allocation
+        self.pending_transactions.clear()
         
         # Create a new transaction for the next mining reward
         reward_tx = {
@@ -174,94 +205,115 @@ class Blockchain:
         return True
     
     def create_transaction(self, transaction):
-        # If it's a dict, keep it as is for backward compatibility
-        if isinstance(transaction, dict):
-            self.pending_transactions.append(transaction)
-        else:
-            # If it's a Transaction object, add it
-            self.pending_transactions.append(transaction)
+        # Pending transactions are kept in dict form; dicts (including legacy
+        # transfers) are stored as is, Transaction objects are serialized once
+        if not isinstance(transaction, dict):
+            transaction = transaction.to_dict()
+        self.pending_transactions.append(transaction)
     
     def get_balance(self, address):
         # Use UTXO model for balance calculation
         return self.utxo_set.get_balance(address)
     
     def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
+        # Resume after the prefix validated last time, unless it was replaced
+        start = 1
+        last_index = self._last_validated_index
+        if (last_index < len(self.chain) and
+                self.chain[last_index].hash == self._last_validated_hash):
+            start = last_index + 1
+            
+            # Recheck from the first block in that prefix changed since; data
+            # edited in place is flagged by calculate_merkle_root()
+            for i in range(1, start):
+                if self.chain[i]._dirty:
+                    start = i
+                    break
+        
+        for i in range(start, len(self.chain)):
             current_block = self.chain[i]
             previous_block = self.chain[i-1]
             
-            # Check if the current block's hash is valid
-            if current_block.hash != current_block.calculate_hash():
+            # Check if the current block's hash matches its current contents
+            if not current_block.verify_hash():
                 print("Current hash is invalid")
                 return False
             
+            # Check the proof of work without rehashing the block
+            if self.consensus_type == "pow" and not current_block.meets_difficulty(self.difficulty):
+                print("Block hash does not meet the difficulty target")
+                return False
+            
             # Check if the current block points to the correct previous hash
             if current_block.previous_hash != previous_block.hash:
                 print("Previous hash reference is invalid")
                 return False
             
-            # Validate all transactions in the block
-            if not self.process_block_transactions(current_block):
-                print("Block contains invalid transactions")
-                return False
+            # Validate the transactions of blocks not yet applied to the UTXO set
+            if current_block.hash not in self._applied_blocks:
+                if not self.process_block_transactions(current_block):
+                    print("Block contains invalid transactions")
+                    return False
+                self._applied_blocks.add(current_block.hash)
         
+        self._last_validated_index = len(self.chain) - 1
+        self._last_validated_hash = self.chain[-1].hash
         return True
     
-    def to_json(self):
-        blockchain_dict = {
+    def to_dict(self):
+        return {
             "chain": [block.to_dict() for block in self.chain],
+            **self._state_dict()
+        }
+    
+    def _state_dict(self):
+        """Everything serialized besides the blocks themselves"""
+        return {
             "difficulty": self.difficulty,
-            "pending_transactions": [
-                tx.to_dict() if hasattr(tx, 'to_dict') else tx 
-                for tx in self.pending_transactions
-            ],
+            "pending_transactions": self.pending_transactions,
             "mining_reward": self.mining_reward,
             "consensus_type": self.consensus_type,
+            "hash_algorithm": self.hash_algorithm,
             "utxo_set": self.utxo_set.to_dict()
         }
-        return json.dumps(blockchain_dict, indent=4)
+    
+    def to_json(self):
+        return self.to_json_bytes().decode()
+    
+    def to_json_bytes(self):
+        """The indented JSON view as UTF-8 bytes, for writing without a str round trip"""
+        return codec.dumps(self.to_dict(), indent=True)
     
     @classmethod
-    def from_json(cls, json_str):
-        data = json.loads(json_str)
+    def from_json(cls, json_str, trusted=False):
+        return cls.from_dict(codec.loads(json_str), trusted)
+    
+    @classmethod
+    def from_dict(cls, data, trusted=False):
+        """Rebuild a blockchain; only trusted (locally saved) data may skip replaying transactions"""
         blockchain = cls(
             consensus_type=data.get("consensus_type", "pow"),
-            difficulty=data["difficulty"]
+            difficulty=data["difficulty"],
+            hash_algorithm=data.get("hash_algorithm", "sha256"),
+            create_genesis=False
         )
         
         # Reconstruct the blockchain
-        blockchain.chain = []
         for block_data in data["chain"]:
-            block = Block(
-                block_data["index"],
-                block_data["previous_hash"],
-                block_data["timestamp"],
-                block_data["data"],
-                block_data["nonce"]
-            )
-            block.hash = block_data["hash"]
-            if "contract_results" in block_data:
-                block.contract_results = block_data["contract_results"]
-            blockchain.chain.append(block)
+            blockchain.chain.append(Block.from_dict(block_data))
         
-        # Reconstruct pending transactions
-        blockchain.pending_transactions = []
-        for tx_data in data["pending_transactions"]:
-            # Handle both dict and Transaction objects
-            if isinstance(tx_data, dict):
-                if "type" in tx_data and tx_data["type"] in ["regular", "coinbase", "contract"]:
-                    tx = Transaction.from_dict(tx_data)
-                else:
-                    tx = tx_data
-            else:
-                tx = tx_data
-            blockchain.pending_transactions.append(tx)
+        # Pending transactions are already stored in dict form
+        blockchain.pending_transactions = data["pending_transactions"]
         
         # Set mining reward
         blockchain.mining_reward = data["mining_reward"]
         
-        # Reconstruct UTXO set
-        if "utxo_set" in data:
+        # Reconstruct UTXO set. A saved snapshot already reflects every block;
+        # anyone else's is ignored and is_chain_valid() replays the blocks
+        if trusted and "utxo_set" in data:
             blockchain.utxo_set = UTXOSet.from_dict(data["utxo_set"])
+            blockchain._applied_blocks = {block.hash for block in blockchain.chain}
+        else:
+            blockchain._create_genesis_utxo()
         
         return blockchain
\ No newline at end of file
@@ -0,0 +1,20 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup; fall back to the stdlib
+    orjson = None
+
+def dumps(obj, indent=False):
+    """Serialize an object to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+def loads(data):
+    """Parse JSON from bytes or str, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,63 +1,98 @@
 import random
 import time
-import hashlib
+import heapq
+import bisect
+from functools import lru_cache
+from itertools import accumulate
+from types import MappingProxyType
+from ._hash import sha256
+
+@lru_cache(maxsize=100_000)
+def _shard_for_address(address, shard_count):
+    """Map an address to a shard by hashing it; cached since addresses repeat"""
+    return int.from_bytes(sha256(address.encode()), 'big') % shard_count
+
+def _sampling_table(weights):
+    """Addresses and their running weight totals, for sampling with bisect"""
+    return list(weights), list(accumulate(weights.values()))
+
+def _selection_seed(blockchain, entropy=None):
+    """Seed validator selection from the chain tip so every node picks the same validator.
+    
+    An integer entropy value is mixed in above the tip's bits, letting callers
+    draw distinct but reproducible selections for the same tip.
+    """
+    if blockchain.chain:
+        seed = int(blockchain.chain[-1].hash[:16], 16) ^ len(blockchain.chain)
+    elif entropy is None:
+        # No agreed-on tip to derive entropy from yet
+        return time.time()
+    else:
+        seed = 0
+    
+    if entropy is not None:
+        seed ^= entropy << 64
+    return seed
+
+def _weighted_choice(rng, table):
+    """Pick an address with probability proportional to its weight"""
+    addresses, cumulative = table
+    return addresses[bisect.bisect_right(cumulative, rng.random() * cumulative[-1])]
+
+def _weighted_choices(rng, table, n):
+    """Pick n addresses independently, each with probability proportional to its weight"""
+    addresses, cumulative = table
+    return rng.choices(addresses, cum_weights=cumulative, k=n)
 
 class ProofOfWork:
     @staticmethod
     def mine(block, difficulty):
-        target = '0' * difficulty
-        while block.hash[:difficulty] != target:
-            block.nonce += 1
-            block.hash = block.calculate_hash()
-        return block
+        # Block.mine_block hashes only the nonce over a cached header midstate
+        # and searches nonces in batches
+        return block.mine_block(difficulty)
 
 class ProofOfStake:
     def __init__(self, blockchain):
         self.blockchain = blockchain
         self.validators = {}  # address -> stake amount
-        self.last_block_time = time.time()
+        self._table = None  # Cached sampling table, rebuilt after stakes change
         self.min_stake = 10  # Minimum stake required to be a validator
     
     def register_validator(self, address, stake_amount):
         if stake_amount >= self.min_stake:
             self.validators[address] = stake_amount
+            self._table = None
             return True
         return False
     
     def remove_validator(self, address):
         if address in self.validators:
             del self.validators[address]
+            self._table = None
             return True
         return False
     
-    def get_next_validator(self):
+    def get_next_validator(self, entropy=None):
         if not self.validators:
             return None
         
-        # Calculate time since last block
-        current_time = time.time()
-        time_diff = current_time - self.last_block_time
-        
-        # Calculate total stake
-        total_stake = sum(self.validators.values())
-        
-        # Select validator based on stake weight and time elapsed
+        # Select validator with probability proportional to its stake
         # This is a simplified version of PoS
-        validator_scores = {}
-        for address, stake in self.validators.items():
-            # Score is based on stake amount and a random factor influenced by time
-            random.seed(f"{address}{current_time}")
-            score = (stake / total_stake) * random.random() * time_diff
-            validator_scores[address] = score
-        
-        # Select the validator with the highest score
-        selected_validator = max(validator_scores.items(), key=lambda x: x[1])[0]
-        
-        # Update last block time
-        self.last_block_time = current_time
+        if self._table is None:
+            self._table = _sampling_table(self.validators)
+        selected_validator = _weighted_choice(random.Random(_selection_seed(self.blockchain, entropy)), self._table)
         
         return selected_validator
     
+    def get_next_validators(self, n, entropy=None):
+        """Select n validators in one pass, each with probability proportional to its stake"""
+        if not self.validators:
+            return []
+        
+        if self._table is None:
+            self._table = _sampling_table(self.validators)
+        return _weighted_choices(random.Random(_selection_seed(self.blockchain, entropy)), self._table, n)
+    
     def validate_block(self, block, validator_address):
         # In a real PoS system, the validator would sign the block
         # Here we just check if they're a registered validator
@@ -74,23 +109,45 @@ class DelegatedProofOfStake:
     def __init__(self, blockchain):
         self.blockchain = blockchain
         self.delegates = {}  # address -> votes
-        self.active_delegates = []  # List of addresses of active delegates
+        self._active_delegates = []  # List of addresses of active delegates
+        self._active_dirty = False  # Set when a vote may have changed the active set
         self.delegate_count = 21  # Number of active delegates
         self.round = 0
     
+    @property
+    def active_delegates(self):
+        if self._active_dirty:
+            self._update_active_delegates()
+        return self._active_delegates
+    
     def vote(self, voter_address, delegate_address, vote_weight):
         if delegate_address in self.delegates:
             self.delegates[delegate_address] += vote_weight
         else:
             self.delegates[delegate_address] = vote_weight
         
-        # Update active delegates
-        self._update_active_delegates()
+        # A delegate outside the active set that still ranks below the weakest
+        # active delegate cannot change the active set, so skip the rebuild
+        active = self._active_delegates
+        if (len(active) < self.delegate_count or delegate_address in active
+                or self.delegates[delegate_address] >= self.delegates[active[-1]]):
+            self._active_dirty = True
+    
+    def vote_batch(self, votes):
+        """Record many (voter_address, delegate_address, vote_weight) votes at once"""
+        delegates = self.delegates
+        get = delegates.get
+        for _, delegate_address, vote_weight in votes:
+            delegates[delegate_address] = get(delegate_address, 0) + vote_weight
+        
+        # Rank the delegates once for the whole batch instead of checking every vote
+        if votes:
+            self._active_dirty = True
     
     def _update_active_delegates(self):
-        # Sort delegates by vote count and select the top ones
-        sorted_delegates = sorted(self.delegates.items(), key=lambda x: x[1], reverse=True)
-        self.active_delegates = [addr for addr, _ in sorted_delegates[:self.delegate_count]]
+        # Select the top delegates by vote count without sorting all of them
+        self._active_delegates = heapq.nlargest(self.delegate_count, self.delegates, key=self.delegates.get)
+        self._active_dirty = False
     
     def get_next_delegate(self):
         if not self.active_delegates:
@@ -117,7 +174,9 @@ class PracticalByzantineFaultTolerance:
     def __init__(self, blockchain):
         self.blockchain = blockchain
         self.validators = set()  # Set of validator addresses
+        self._sorted_validators = []  # Validator addresses kept in sorted order
         self.min_validators = 4  # Minimum number of validators required
+        self._quorum = 0  # 2f+1 where f is max faulty nodes
         self.current_view = 0  # Current view number
         self.primary = None  # Primary validator for the current view
         self.prepared_messages = {}  # Block hash -> set of validators who prepared
@@ -125,7 +184,10 @@ class PracticalByzantineFaultTolerance:
     
     def add_validator(self, address):
         """Add a validator to the PBFT network"""
-        self.validators.add(address)
+        if address not in self.validators:
+            self.validators.add(address)
+            bisect.insort(self._sorted_validators, address)
+            self._update_quorum()
         self._update_primary()
         return True
     
@@ -133,19 +195,24 @@ class PracticalByzantineFaultTolerance:
         """Remove a validator from the PBFT network"""
         if address in self.validators:
             self.validators.remove(address)
+            del self._sorted_validators[bisect.bisect_left(self._sorted_validators, address)]
+            self._update_quorum()
             self._update_primary()
             return True
         return False
     
+    def _update_quorum(self):
+        """Recompute the 2f+1 message threshold after the validator set changes"""
+        self._quorum = 2 * ((len(self.validators) - 1) // 3) + 1
+    
     def _update_primary(self):
         """Update the primary validator for the current view"""
         if not self.validators:
             self.primary = None
             return
         
-        # Sort validators to ensure deterministic selection
-        sorted_validators = sorted(list(self.validators))
-        self.primary = sorted_validators[self.current_view % len(sorted_validators)]
+        # Validators are kept sorted to ensure deterministic selection
+        self.primary = self._sorted_validators[self.current_view % len(self._sorted_validators)]
     
     def change_view(self):
         """Change to the next view (used when primary is suspected to be faulty)"""
@@ -172,14 +239,11 @@ class PracticalByzantineFaultTolerance:
         if validator_address not in self.validators:
             return False, "Not a validator"
         
-        if block_hash not in self.prepared_messages:
-            self.prepared_messages[block_hash] = set()
-        
-        self.prepared_messages[block_hash].add(validator_address)
+        prepared = self.prepared_messages.setdefault(block_hash, set())
+        prepared.add(validator_address)
         
         # Check if we have enough prepare messages (2f+1 where f is max faulty nodes)
-        f = (len(self.validators) - 1) // 3
-        if len(self.prepared_messages[block_hash]) >= 2*f + 1:
+        if len(prepared) >= self._quorum:
             return True, "Prepared"
         
         return True, "Prepare recorded"
@@ -190,26 +254,66 @@ class PracticalByzantineFaultTolerance:
             return False, "Not a validator"
         
         # Check if we have enough prepare messages first
-        f = (len(self.validators) - 1) // 3
-        if block_hash not in self.prepared_messages or len(self.prepared_messages[block_hash]) < 2*f + 1:
+        if len(self.prepared_messages.get(block_hash, ())) < self._quorum:
             return False, "Not prepared yet"
         
-        if block_hash not in self.committed_messages:
-            self.committed_messages[block_hash] = set()
-        
-        self.committed_messages[block_hash].add(validator_address)
+        committed = self.committed_messages.setdefault(block_hash, set())
+        committed.add(validator_address)
         
         # Check if we have enough commit messages
-        if len(self.committed_messages[block_hash]) >= 2*f + 1:
+        if len(committed) >= self._quorum:
             return True, "Committed"
         
         return True, "Commit recorded"
     
+    def prepare_batch(self, block_hash, validator_addresses):
+        """Record prepare messages from many validators, returning validator -> (success, message)"""
+        validators = self.validators
+        quorum = self._quorum
+        prepared = None  # Created on the first valid vote, as prepare() does
+        
+        # Same outcome as calling prepare() for each validator in order
+        results = {}
+        for address in validator_addresses:
+            if address not in validators:
+                results[address] = (False, "Not a validator")
+                continue
+            
+            if prepared is None:
+                prepared = self.prepared_messages.setdefault(block_hash, set())
+            prepared.add(address)
+            results[address] = (True, "Prepared" if len(prepared) >= quorum else "Prepare recorded")
+        
+        return results
+    
+    def commit_batch(self, block_hash, validator_addresses):
+        """Record commit messages from many validators, returning validator -> (success, message)"""
+        validators = self.validators
+        quorum = self._quorum
+        
+        # Committing does not change the prepare count, so check it once
+        is_prepared = len(self.prepared_messages.get(block_hash, ())) >= quorum
+        committed = None  # Created on the first valid vote, as commit() does
+        
+        # Same outcome as calling commit() for each validator in order
+        results = {}
+        for address in validator_addresses:
+            if address not in validators:
+                results[address] = (False, "Not a validator")
+            elif not is_prepared:
+                results[address] = (False, "Not prepared yet")
+            else:
+                if committed is None:
+                    committed = self.committed_messages.setdefault(block_hash, set())
+                committed.add(address)
+                results[address] = (True, "Committed" if len(committed) >= quorum else "Commit recorded")
+        
+        return results
+    
     def is_committed(self, block_hash):
         """Check if a block is committed"""
-        f = (len(self.validators) - 1) // 3
         return (block_hash in self.committed_messages and 
-                len(self.committed_messages[block_hash]) >= 2*f + 1)
+                len(self.committed_messages[block_hash]) >= self._quorum)
     
     def validate_block(self, block, validator_address):
         """Validate a block in the PBFT system"""
@@ -220,19 +324,23 @@ class ProofOfAuthority:
     def __init__(self, blockchain):
         self.blockchain = blockchain
         self.authorities = set()  # Set of authorized validator addresses
+        self._sorted_authorities = []  # Authority addresses kept in sorted order
         self.block_time = 15  # Seconds between blocks
         self.last_block_time = time.time()
         self.current_authority_index = 0
     
     def add_authority(self, address):
         """Add an authority to the network"""
-        self.authorities.add(address)
+        if address not in self.authorities:
+            self.authorities.add(address)
+            bisect.insort(self._sorted_authorities, address)
         return True
     
     def remove_authority(self, address):
         """Remove an authority from the network"""
         if address in self.authorities:
             self.authorities.remove(address)
+            del self._sorted_authorities[bisect.bisect_left(self._sorted_authorities, address)]
             return True
         return False
     
@@ -246,11 +354,9 @@ class ProofOfAuthority:
         if current_time - self.last_block_time < self.block_time:
             return None
         
-        # Get authorities in a deterministic order
-        sorted_authorities = sorted(list(self.authorities))
-        
-        # Select the next authority in round-robin fashion
-        authority = sorted_authorities[self.current_authority_index % len(sorted_authorities)]
+        # Select the next authority in round-robin fashion; authorities are
+        # kept sorted so the order is deterministic
+        authority = self._sorted_authorities[self.current_authority_index % len(self._sorted_authorities)]
         self.current_authority_index += 1
         
         # Update last block time
@@ -272,11 +378,23 @@ class ProofOfAuthority:
 class ProofOfBurn:
     def __init__(self, blockchain):
         self.blockchain = blockchain
-        self.burn_addresses = {}  # address -> amount burned
+        self._burned = {}  # address -> amount burned, before applying _decay_scale
+        self._decay_scale = 1.0  # Decay accumulated by every burn since it was recorded
+        self._table = None  # Cached sampling table, rebuilt after burns change
         self.min_burn_amount = 10  # Minimum amount required to participate
         self.burn_decay_factor = 0.9  # Decay factor for burned coins (simulates coin aging)
         self.last_update_time = time.time()
     
+    @property
+    def burn_addresses(self):
+        """Read-only snapshot of the burned amount per address with decay applied"""
+        scale = self._decay_scale
+        return MappingProxyType({address: amount * scale for address, amount in self._burned.items()})
+    
+    def get_burned(self, address):
+        """Burned amount for one address with decay applied"""
+        return self._burned.get(address, 0) * self._decay_scale
+    
     def burn_coins(self, address, amount):
         """Record coins as burned by sending to an unspendable address"""
         if amount < self.min_burn_amount:
@@ -285,11 +403,9 @@ class ProofOfBurn:
         # Update existing burns with decay
         self._apply_decay()
         
-        # Add new burn amount
-        if address in self.burn_addresses:
-            self.burn_addresses[address] += amount
-        else:
-            self.burn_addresses[address] = amount
+        # Add new burn amount, stored relative to the current decay scale
+        self._burned[address] = self._burned.get(address, 0) + amount / self._decay_scale
+        self._table = None
         
         return True, f"Burned {amount} coins"
     
@@ -299,44 +415,53 @@ class ProofOfBurn:
         time_diff_days = (current_time - self.last_update_time) / (24 * 3600)  # Convert to days
         
         if time_diff_days > 0:
-            decay_factor = self.burn_decay_factor ** time_diff_days
-            for address in self.burn_addresses:
-                self.burn_addresses[address] *= decay_factor
+            # Decay applies to every burn equally, so track it as one scale
+            # instead of rewriting each amount
+            self._decay_scale *= self.burn_decay_factor ** time_diff_days
+            
+            # Fold the scale into the amounts before it can underflow
+            if self._decay_scale < 1e-100:
+                for address in self._burned:
+                    self._burned[address] *= self._decay_scale
+                self._decay_scale = 1.0
+                self._table = None
             
             self.last_update_time = current_time
     
-    def get_next_validator(self):
+    def get_next_validator(self, entropy=None):
         """Select the next validator based on burned coins"""
-        if not self.burn_addresses:
+        if not self._burned:
             return None
         
         # Apply decay to burned coins
         self._apply_decay()
         
-        # Calculate total burned coins
-        total_burned = sum(self.burn_addresses.values())
-        
-        # Select validator based on burn weight
-        validator_scores = {}
-        for address, burned in self.burn_addresses.items():
-            # Score is based on burn amount and a random factor
-            random.seed(f"{address}{time.time()}")
-            score = (burned / total_burned) * random.random()
-            validator_scores[address] = score
-        
-        # Select the validator with the highest score
-        selected_validator = max(validator_scores.items(), key=lambda x: x[1])[0]
+        # Select validator with probability proportional to its burn; the
+        # decay scale is a common factor and does not change the odds
+        if self._table is None:
+            self._table = _sampling_table(self._burned)
+        selected_validator = _weighted_choice(random.Random(_selection_seed(self.blockchain, entropy)), self._table)
         
         return selected_validator
     
+    def get_next_validators(self, n, entropy=None):
+        """Select n validators in one pass, each with probability proportional to its burn"""
+        if not self._burned:
+            return []
+        
+        self._apply_decay()
+        if self._table is None:
+            self._table = _sampling_table(self._burned)
+        return _weighted_choices(random.Random(_selection_seed(self.blockchain, entropy)), self._table, n)
+    
     def validate_block(self, block, validator_address):
         """Validate a block in the PoB system"""
         # Check if the validator has burned coins
-        if validator_address not in self.burn_addresses:
+        if validator_address not in self._burned:
             return False
         
         # Check if they've burned enough
-        if self.burn_addresses[validator_address] < self.min_burn_amount:
+        if self.get_burned(validator_address) < self.min_burn_amount:
             return False
         
         # Verify the block's hash
@@ -359,9 +484,9 @@ class HybridConsensus:
         """Register a validator with stake"""
         return self.pos.register_validator(address, stake_amount)
     
-    def get_next_validator(self):
+    def get_next_validator(self, entropy=None):
         """Get the next validator using PoS"""
-        return self.pos.get_next_validator()
+        return self.pos.get_next_validator(entropy)
     
     def mine_block(self, block, validator_address):
         """Mine a block using hybrid approach"""
@@ -377,7 +502,7 @@ class HybridConsensus:
     def validate_block(self, block, validator_address):
         """Validate a block using hybrid approach"""
         # Check PoW component
-        if block.hash[:self.difficulty] != '0' * self.difficulty:
+        if not block.meets_difficulty(self.difficulty):
             return False
         
         # Check PoS component
@@ -441,8 +566,7 @@ class ShardingConsensus:
                 return 0
         
         # Hash the address to determine shard
-        address_hash = int(hashlib.sha256(address.encode()).hexdigest(), 16)
-        return address_hash % self.shard_count
+        return _shard_for_address(address, self.shard_count)
     
     def get_next_validator(self, shard_id=None):
         """Get the next validator for a specific shard or for cross-shard consensus"""
@@ -459,19 +583,41 @@ class ShardingConsensus:
     
     def validate_block(self, block, validator_address, shard_id=None):
         """Validate a block for a specific shard or for cross-shard consensus"""
-        # Check if validator is assigned to the correct shard
-        if validator_address in self.validator_to_shard:
-            validator_shard = self.validator_to_shard[validator_address]
+        return self.validate_blocks([(block, validator_address, shard_id)])[0]
+    
+    def validate_blocks(self, entries):
+        """Validate (block, validator_address, shard_id) entries, rejecting a bad block hash only once"""
+        hash_valid = {}  # id(block) -> whether its stored hash matches its contents
+        results = []
+        
+        for block, validator_address, shard_id in entries:
+            # Check if validator is assigned to the correct shard
+            if validator_address not in self.validator_to_shard:
+                results.append((False, "Validator not registered"))
+                continue
             
-            if shard_id is not None and validator_shard != shard_id:
-                return False, f"Validator not assigned to shard {shard_id}"
+            if shard_id is not None and self.validator_to_shard[validator_address] != shard_id:
+                results.append((False, f"Validator not assigned to shard {shard_id}"))
+                continue
             
             # Use the appropriate consensus mechanism
             if shard_id is None:
                 # Cross-shard block
-                return self.global_consensus.validate_block(block, validator_address), "Validated with global consensus"
+                consensus, message = self.global_consensus, "Validated with global consensus"
             else:
                 # Shard-specific block
-                return self.shards[shard_id]['consensus'].validate_block(block, validator_address), f"Validated for shard {shard_id}"
+                consensus, message = self.shards[shard_id]['consensus'], f"Validated for shard {shard_id}"
+            
+            # The same block is often checked by several validators and shards;
+            # one with a bad hash fails for all of them, so check that once
+            key = id(block)
+            if key not in hash_valid:
+                hash_valid[key] = block.hash == block.calculate_hash()
+            if not hash_valid[key]:
+                results.append((False, message))
+                continue
+            
+            # The shard's own rules decide the rest
+            results.append((consensus.validate_block(block, validator_address), message))
         
-        return False, "Validator not registered"
\ No newline at end of file
+        return results
@@ -1,56 +1,101 @@
+import asyncio
 import socket
+import struct
 import threading
-import json
 import time
+from . import codec
 from .blockchain import Blockchain
 
+# Every message is sent as a 4-byte big-endian length followed by the payload
+FRAME_HEADER = struct.Struct('>I')
+
+# Largest frame accepted from a peer; a whole-chain reply is the biggest message
+MAX_FRAME_SIZE = 64 << 20
+
+# Seconds to wait for a peer to accept a connection
+CONNECT_TIMEOUT = 2.0
+
 class P2PServer:
     def __init__(self, host='0.0.0.0', port=5000, blockchain=None):
         self.host = host
         self.port = port
         self.blockchain = blockchain or Blockchain()
-        self.peers = set()
-        self.server_socket = None
+        self.peers = {}  # "host:port" -> StreamWriter of the open connection
+        self._dialed = {}  # "host:port" -> (host, port) of peers we connected to, redialed on demand
+        self.latencies = {}  # "host:port" -> milliseconds taken to connect to a dialed peer
+        self.max_outbound = 8  # Most peers to stay connected to, keeping the fastest
+        self.server = None
+        self.loop = None
+    
+    def _ensure_loop(self):
+        """Run the node's event loop in a background thread"""
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
+    
+    def _run(self, coro):
+        """Run a coroutine on the node's event loop and wait for its result"""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
     
     def start(self):
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
-        
+        self._run(self._start_server())
         print(f"P2P Server started on {self.host}:{self.port}")
-        
-        # Start listening for connections in a separate thread
-        threading.Thread(target=self.listen_for_connections, daemon=True).start()
     
-    def listen_for_connections(self):
-        while True:
-            client, address = self.server_socket.accept()
-            print(f"New connection from {address[0]}:{address[1]}")
-            
-            # Handle client in a new thread
-            threading.Thread(target=self.handle_client, args=(client, address), daemon=True).start()
+    async def _start_server(self):
+        self.server = await asyncio.start_server(self._on_connection, self.host, self.port, reuse_address=True)
+    
+    async def _on_connection(self, reader, writer):
+        host, port = writer.get_extra_info('peername')[:2]
+        print(f"New connection from {host}:{port}")
+        await self._handle_peer(f"{host}:{port}", reader, writer)
+    
+    def _configure_socket(self, writer):
+        """Flush small messages immediately and detect dead long-lived connections"""
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
     
-    def handle_client(self, client_socket, address):
-        peer_address = f"{address[0]}:{address[1]}"
-        self.peers.add(peer_address)
+    async def _handle_peer(self, peer_address, reader, writer):
+        # Keep the connection open so later broadcasts reuse it
+        self.peers[peer_address] = writer
+        self._configure_socket(writer)
         
         try:
             while True:
-                data = client_socket.recv(4096)
-                if not data:
-                    break
-                
-                message = json.loads(data.decode('utf-8'))
-                self.handle_message(message, client_socket)
+                message = await self._read_message(reader)
+                await self.handle_message(message, writer)
+        except asyncio.IncompleteReadError:
+            pass  # Peer closed the connection
         except Exception as e:
             print(f"Error handling client {peer_address}: {e}")
         finally:
-            client_socket.close()
-            if peer_address in self.peers:
-                self.peers.remove(peer_address)
+            writer.close()
+            if self.peers.get(peer_address) is writer:
+                del self.peers[peer_address]
     
-    def handle_message(self, message, client_socket):
+    async def _read_message(self, reader):
+        (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+        if length > MAX_FRAME_SIZE:
+            # Refuse before reading, so a peer cannot make us buffer gigabytes;
+            # _handle_peer reports the error and closes the connection
+            raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+        return codec.loads(await reader.readexactly(length))
+    
+    def _frame(self, message):
+        """Encode a message as (length header, payload) without joining the two"""
+        payload = codec.dumps(message)
+        return FRAME_HEADER.pack(len(payload)), payload
+    
+    async def _send_frame(self, writer, frame):
+        writer.writelines(frame)
+        await writer.drain()
+    
+    async def _send(self, writer, message):
+        await self._send_frame(writer, self._frame(message))
+    
+    async def handle_message(self, message, writer):
         message_type = message.get('type')
         
         if message_type == 'get_blockchain':
@@ -59,14 +104,18 @@ class P2PServer:
                 'type': 'blockchain',
                 'data': self.blockchain.to_json()
             }
-            client_socket.send(json.dumps(response).encode('utf-8'))
+            await self._send(writer, response)
         
         elif message_type == 'blockchain':
-            # Received a blockchain, validate and potentially replace ours
-            received_chain = Blockchain.from_json(message['data'])
+            # Received a blockchain, validate and potentially replace ours.
+            # Decoding and validating a whole chain is slow, so it runs in a
+            # worker thread rather than stalling every other connection.
+            received_chain = await asyncio.get_running_loop().run_in_executor(
+                None, self._longer_valid_chain, message['data']
+            )
             
-            # Simple validation: longer chain wins
-            if len(received_chain.chain) > len(self.blockchain.chain) and received_chain.is_chain_valid():
+            # Ours may have grown while the received chain was checked
+            if received_chain and len(received_chain.chain) > len(self.blockchain.chain):
                 print("Received a longer valid blockchain. Replacing our chain.")
                 self.blockchain = received_chain
         
@@ -81,18 +130,51 @@ class P2PServer:
             # This would require more complex logic in a real implementation
             print("Received new block notification")
             # Request the latest blockchain to compare
-            self.request_blockchain(client_socket)
+            await self.request_blockchain(writer)
+    
+    def _longer_valid_chain(self, data):
+        """Decode a received chain, returning it only if it is longer than ours and valid"""
+        received_chain = Blockchain.from_json(data)
+        
+        # Simple validation: longer chain wins
+        if len(received_chain.chain) > len(self.blockchain.chain) and received_chain.is_chain_valid():
+            return received_chain
+        return None
     
     def broadcast(self, message):
-        for peer in self.peers:
-            try:
-                host, port = peer.split(':')
-                client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                client.connect((host, int(port)))
-                client.send(json.dumps(message).encode('utf-8'))
-                client.close()
-            except Exception as e:
-                print(f"Failed to send to peer {peer}: {e}")
+        if self.peers or self._dialed:
+            self._run(self._broadcast(message))
+    
+    async def _redial(self, peer, host, port):
+        try:
+            await asyncio.wait_for(self._dial(peer, host, port), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            # A peer that hangs would stall every broadcast; stop redialing it
+            print(f"Failed to reconnect to peer {peer}: timed out, dropping it")
+            self._drop_peer(peer)
+        except OSError as e:
+            print(f"Failed to reconnect to peer {peer}: {e}")
+    
+    async def _broadcast(self, message):
+        # Reopen connections to peers we dialed whose connection was dropped,
+        # all at once so one slow peer does not hold up the others
+        await asyncio.gather(*(self._redial(peer, host, port)
+                               for peer, (host, port) in self._dialed.items()
+                               if peer not in self.peers))
+        
+        # Encode once, then send to every peer concurrently over the already
+        # open connections
+        frame = self._frame(message)
+        peers = list(self.peers.items())
+        results = await asyncio.gather(*(self._send_frame(writer, frame) for _, writer in peers),
+                                       return_exceptions=True)
+        
+        for (peer, writer), result in zip(peers, results):
+            if isinstance(result, Exception):
+                print(f"Failed to send to peer {peer}: {result}")
+                writer.close()
+                if self.peers.get(peer) is writer:
+                    del self.peers[peer]
     
     def connect_to_peer(self, host, port):
         peer_address = f"{host}:{port}"
@@ -101,23 +183,87 @@ class P2PServer:
             return
         
         try:
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client.connect((host, int(port)))
-            self.peers.add(peer_address)
-            
-            # Request the blockchain from the new peer
-            self.request_blockchain(client)
-            client.close()
-            
+            self._run(self._connect(peer_address, host, int(port)))
             print(f"Connected to peer {peer_address}")
         except Exception as e:
             print(f"Failed to connect to peer {host}:{port}: {e}")
     
-    def request_blockchain(self, client_socket):
+    def connect_to_peers(self, addresses):
+        """Connect to several (host, port) peers at once, keeping the fastest max_outbound"""
+        addresses = [(host, int(port)) for host, port in addresses]
+        results = self._run(self._connect_all(addresses))
+        
+        for (host, port), result in zip(addresses, results):
+            peer_address = f"{host}:{port}"
+            if isinstance(result, asyncio.TimeoutError):
+                print(f"Failed to connect to peer {peer_address}: timed out")
+            elif isinstance(result, Exception):
+                print(f"Failed to connect to peer {peer_address}: {result}")
+            elif not result:
+                print(f"Already connected to {peer_address}")
+            elif peer_address in self.peers:
+                print(f"Connected to peer {peer_address} in {self.latencies[peer_address]:.1f} ms")
+            else:
+                print(f"Dropped peer {peer_address}: slower than {self.max_outbound} other peers")
+    
+    async def _connect_all(self, addresses):
+        # Dial every peer concurrently so startup waits for the slowest
+        # connection rather than the sum of them
+        results = await asyncio.gather(*(self._timed_connect(host, port) for host, port in addresses),
+                                       return_exceptions=True)
+        
+        # Past the outbound cap, drop the slowest peers we dialed
+        by_latency = sorted(self._dialed, key=lambda peer: self.latencies.get(peer, float('inf')))
+        for peer in by_latency[self.max_outbound:]:
+            self._drop_peer(peer)
+        
+        return results
+    
+    async def _timed_connect(self, host, port):
+        peer_address = f"{host}:{port}"
+        if peer_address in self.peers:
+            return False
+        
+        # Time and bound only the dial itself, not the request that follows
+        start = time.perf_counter()
+        writer = await asyncio.wait_for(self._dial(peer_address, host, port), CONNECT_TIMEOUT)
+        self.latencies[peer_address] = (time.perf_counter() - start) * 1000
+        
+        try:
+            await self.request_blockchain(writer)
+        except Exception:
+            self._drop_peer(peer_address)
+            raise
+        return True
+    
+    def _drop_peer(self, peer_address):
+        """Close a peer's connection and forget it, so broadcasts do not redial it"""
+        self._dialed.pop(peer_address, None)
+        self.latencies.pop(peer_address, None)
+        writer = self.peers.pop(peer_address, None)
+        if writer is not None:
+            writer.close()
+    
+    async def _dial(self, peer_address, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        self.peers[peer_address] = writer
+        self._dialed[peer_address] = (host, port)
+        
+        # Listen for the peer's replies on the same connection
+        asyncio.ensure_future(self._handle_peer(peer_address, reader, writer))
+        return writer
+    
+    async def _connect(self, peer_address, host, port):
+        writer = await self._dial(peer_address, host, port)
+        
+        # Request the blockchain from the new peer
+        await self.request_blockchain(writer)
+    
+    async def request_blockchain(self, writer):
         message = {
             'type': 'get_blockchain'
         }
-        client_socket.send(json.dumps(message).encode('utf-8'))
+        await self._send(writer, message)
     
     def broadcast_transaction(self, transaction):
         message = {
@@ -132,7 +278,19 @@ class P2PServer:
         }
         self.broadcast(message)
     
+    async def _close(self):
+        for writer in self.peers.values():
+            writer.close()
+        self.peers.clear()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+    
     def stop(self):
-        if self.server_socket:
-            self.server_socket.close()
-            print("P2P Server stopped")
\ No newline at end of file
+        if self.loop is not None:
+            self._run(self._close())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+        if self.server:
+            self.server = None
+            print("P2P Server stopped")
@@ -1,125 +1,191 @@
-import hashlib
+import os
 import time
 import json
 import base64
 import secrets
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
 from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import serialization
 from cryptography.fernet import Fernet
+from ._hash import sha256, hash_layer
+from .block import merkle_leaves
+
+# Number of Merkle trees kept for repeat proof requests
+MERKLE_TREE_CACHE_SIZE = 128
+
+# PBKDF2-HMAC-SHA256 work factor for derived keys and password hashes
+PBKDF2_ITERATIONS = 100000
+
+# Random bytes read from the OS at a time for salts
+RANDOM_POOL_SIZE = 4096
+
+_rand_pool = b''
+_rand_off = 0
+_rand_lock = threading.Lock()
+
+def _take(n):
+    """Return n fresh random bytes, sliced from a pool refilled from os.urandom"""
+    global _rand_pool, _rand_off
+    with _rand_lock:
+        if _rand_off + n > len(_rand_pool):
+            _rand_pool = os.urandom(max(RANDOM_POOL_SIZE, n))
+            _rand_off = 0
+        # Every byte is handed out once, so no two salts share randomness
+        chunk = _rand_pool[_rand_off:_rand_off + n]
+        _rand_off += n
+    return chunk
+
+def _reset_random_pool():
+    """Discard the pool in a forked child, which would otherwise hand out its parent's bytes"""
+    global _rand_pool, _rand_off, _rand_lock
+    _rand_pool = b''
+    _rand_off = 0
+    _rand_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_random_pool)
+
+def _derive_key(password, salt):
+    """Derive a 32-byte key from a password with PBKDF2-HMAC-SHA256"""
+    # hashlib runs the whole iteration loop inside OpenSSL
+    return hashlib.pbkdf2_hmac('sha256', password, salt, PBKDF2_ITERATIONS, dklen=32)
+
+# Salt used to derive encryption keys when the caller does not supply one;
+# kept so data encrypted before salts were configurable still decrypts
+DEFAULT_ENCRYPTION_SALT = b'blockchain_salt'
+
+# Number of derived encryption keys kept for reused passphrases
+FERNET_CACHE_SIZE = 128
+
+_fernet_cache = OrderedDict()  # keyed digest of (salt, passphrase) -> Fernet, least recently used first
+_fernet_lock = threading.Lock()
+
+# Per-process key for the cache digests, so cached entries cannot be used to
+# check passphrase guesses
+_fernet_cache_key = os.urandom(32)
+
+def _get_fernet(key, salt=DEFAULT_ENCRYPTION_SALT):
+    """Build the Fernet cipher for a key and salt, cached so a reused passphrase is derived once"""
+    # Ensure the key is valid for Fernet (32 bytes, base64-encoded)
+    if len(key) == 32:
+        return Fernet(base64.urlsafe_b64encode(key))
+    
+    # Look the derived key up by a digest so the passphrase itself is not retained
+    digest = hmac.new(_fernet_cache_key, len(salt).to_bytes(4, 'big') + salt + key, hashlib.sha256).digest()
+    with _fernet_lock:
+        fernet = _fernet_cache.get(digest)
+        if fernet is not None:
+            _fernet_cache.move_to_end(digest)
+            return fernet
+    
+    # Derive a proper key using PBKDF2
+    fernet = Fernet(base64.urlsafe_b64encode(_derive_key(key, salt)))
+    with _fernet_lock:
+        _fernet_cache[digest] = fernet
+        if len(_fernet_cache) > FERNET_CACHE_SIZE:
+            _fernet_cache.popitem(last=False)
+    return fernet
 
 class SecurityManager:
     def __init__(self):
-        self.merkle_tree_cache = {}
+        self.merkle_tree_cache = OrderedDict()  # Merkle root -> tree levels, least recently used first
+    
+    def _build_merkle_tree(self, leaves):
+        """Build every level of the Merkle tree bottom-up from a buffer of leaf digests"""
+        levels = []
+        layer = leaves
+        
+        while len(layer) > 32:
+            if len(layer) % 64:
+                layer += layer[-32:]  # Duplicate the last hash if odd number
+            levels.append([layer[i:i + 32] for i in range(0, len(layer), 32)])
+            layer = hash_layer(layer)
+        
+        levels.append([layer])
+        return levels
+    
+    def _merkle_tree(self, transactions):
+        """Build the tree levels for a transaction list, keeping them for proofs by root"""
+        levels = self._build_merkle_tree(merkle_leaves(transactions))
+        root = levels[-1][0].hex()
+        self.merkle_tree_cache[root] = levels
+        self.merkle_tree_cache.move_to_end(root)
+        if len(self.merkle_tree_cache) > MERKLE_TREE_CACHE_SIZE:
+            self.merkle_tree_cache.popitem(last=False)
+        return levels
     
     def calculate_merkle_root(self, transactions):
         """Calculate the Merkle root of a list of transactions"""
         if not transactions:
-            return hashlib.sha256("".encode()).hexdigest()
-        
-        # Convert transactions to hashes if they're not already
-        tx_hashes = []
-        for tx in transactions:
-            if isinstance(tx, str) and len(tx) == 64:  # Assuming it's already a hash
-                tx_hashes.append(tx)
-            else:
-                # Convert to JSON and hash
-                tx_json = json.dumps(tx, sort_keys=True).encode()
-                tx_hashes.append(hashlib.sha256(tx_json).hexdigest())
-        
-        # Build the Merkle tree
-        while len(tx_hashes) > 1:
-            if len(tx_hashes) % 2 != 0:
-                tx_hashes.append(tx_hashes[-1])  # Duplicate the last hash if odd number
-            
-            next_level = []
-            for i in range(0, len(tx_hashes), 2):
-                combined = tx_hashes[i] + tx_hashes[i+1]
-                next_level.append(hashlib.sha256(combined.encode()).hexdigest())
-            
-            tx_hashes = next_level
+            return sha256(b"").hex()
         
-        return tx_hashes[0]
+        # Hash raw 32-byte digests, same as Block.merkle_root, and hex-encode
+        # only the root; the tree is kept so proofs can reuse it
+        return self._merkle_tree(transactions)[-1][0].hex()
     
     def verify_merkle_proof(self, tx_hash, merkle_proof, merkle_root):
         """Verify that a transaction is part of a block using a Merkle proof"""
-        current_hash = tx_hash
-        
-        for sibling_hash, is_left in merkle_proof:
-            if is_left:
-                current_hash = hashlib.sha256((sibling_hash + current_hash).encode()).hexdigest()
-            else:
-                current_hash = hashlib.sha256((current_hash + sibling_hash).encode()).hexdigest()
-        
-        return current_hash == merkle_root
+        try:
+            current_hash = bytes.fromhex(tx_hash)
+            
+            for sibling_hash, is_left in merkle_proof:
+                sibling = bytes.fromhex(sibling_hash)
+                if is_left:
+                    current_hash = sha256(sibling + current_hash)
+                else:
+                    current_hash = sha256(current_hash + sibling)
+        except ValueError:
+            return False  # Not a hex digest
+        
+        return current_hash.hex() == merkle_root
     
     def generate_merkle_proof(self, tx_hash, transactions):
-        """Generate a Merkle proof for a transaction"""
-        # Convert transactions to hashes
-        tx_hashes = []
-        tx_index = -1
-        
-        for i, tx in enumerate(transactions):
-            if isinstance(tx, str) and len(tx) == 64:
-                tx_hash_i = tx
-            else:
-                tx_json = json.dumps(tx, sort_keys=True).encode()
-                tx_hash_i = hashlib.sha256(tx_json).hexdigest()
-            
-            tx_hashes.append(tx_hash_i)
-            if tx_hash_i == tx_hash:
-                tx_index = i
+        """Generate a Merkle proof for a transaction from the block's transactions"""
+        if not transactions:
+            return None
         
-        if tx_index == -1:
+        return self._merkle_proof(tx_hash, self._merkle_tree(transactions))
+    
+    def generate_merkle_proof_for_root(self, tx_hash, merkle_root):
+        """Generate a Merkle proof from a tree built earlier, looked up by its root"""
+        # Only trees that are still cached can be looked up by root
+        levels = self.merkle_tree_cache.get(merkle_root)
+        if levels is None:
+            return None  # Unknown root
+        self.merkle_tree_cache.move_to_end(merkle_root)
+        
+        return self._merkle_proof(tx_hash, levels)
+    
+    def _merkle_proof(self, tx_hash, levels):
+        """Collect the sibling hashes from a transaction's leaf up to the root"""
+        try:
+            index = levels[0].index(bytes.fromhex(tx_hash))
+        except ValueError:
             return None  # Transaction not found
         
         proof = []
-        index = tx_index
         
-        # Build the proof by traversing up the tree
-        while len(tx_hashes) > 1:
-            if len(tx_hashes) % 2 != 0:
-                tx_hashes.append(tx_hashes[-1])
-            
-            next_level = []
-            for i in range(0, len(tx_hashes), 2):
-                if i == index or i + 1 == index:
-                    # This is the sibling we need for the proof
-                    sibling_index = i if index == i + 1 else i + 1
-                    is_left = sibling_index < index
-                    proof.append((tx_hashes[sibling_index], is_left))
-                    
-                    # Update index for the next level
-                    index = i // 2
-                
-                combined = tx_hashes[i] + tx_hashes[i+1]
-                next_level.append(hashlib.sha256(combined.encode()).hexdigest())
-            
-            tx_hashes = next_level
+        # Build the proof by traversing up the tree; odd levels were padded
+        # when the tree was built, so every node has a sibling at index ^ 1
+        for tx_hashes in levels[:-1]:
+            sibling_index = index ^ 1
+            proof.append((tx_hashes[sibling_index].hex(), sibling_index < index))
+            index >>= 1
         
         return proof
     
-    def encrypt_data(self, data, key):
+    def encrypt_data(self, data, key, salt=DEFAULT_ENCRYPTION_SALT):
         """Encrypt data using Fernet symmetric encryption"""
         if isinstance(key, str):
             # Convert string key to bytes
             key = key.encode()
+        if isinstance(salt, str):
+            salt = salt.encode()
         
-        # Ensure the key is valid for Fernet (32 bytes, base64-encoded)
-        if len(key) != 32:
-            # Derive a proper key using PBKDF2
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=b'blockchain_salt',  # In production, use a unique salt
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(key))
-        else:
-            key = base64.urlsafe_b64encode(key)
-        
-        f = Fernet(key)
+        f = _get_fernet(key, salt)
         
         # Convert data to JSON string if it's not already a string
         if not isinstance(data, str):
@@ -129,24 +195,14 @@ class SecurityManager:
         encrypted_data = f.encrypt(data.encode())
         return base64.urlsafe_b64encode(encrypted_data).decode()
     
-    def decrypt_data(self, encrypted_data, key):
+    def decrypt_data(self, encrypted_data, key, salt=DEFAULT_ENCRYPTION_SALT):
         """Decrypt data using Fernet symmetric encryption"""
         if isinstance(key, str):
             key = key.encode()
+        if isinstance(salt, str):
+            salt = salt.encode()
         
-        # Ensure the key is valid for Fernet
-        if len(key) != 32:
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=b'blockchain_salt',
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(key))
-        else:
-            key = base64.urlsafe_b64encode(key)
-        
-        f = Fernet(key)
+        f = _get_fernet(key, salt)
         
         # Decode the base64 encrypted data
         encrypted_data = base64.urlsafe_b64decode(encrypted_data)
@@ -164,37 +220,29 @@ class SecurityManager:
         """Generate cryptographically secure random bytes"""
         return secrets.token_bytes(length)
     
-    def hash_password(self, password, salt=None):
-        """Hash a password with a salt using PBKDF2"""
+    def hash_password_raw(self, password, salt=None):
+        """Hash a password with a salt using PBKDF2, returning (key, salt) as raw bytes"""
         if salt is None:
-            salt = secrets.token_bytes(16)
+            salt = _take(16)
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        
-        key = kdf.derive(password.encode())
+        return _derive_key(password.encode(), salt), salt
+    
+    def hash_password(self, password, salt=None):
+        """Hash a password with a salt using PBKDF2"""
+        key, salt = self.hash_password_raw(password, salt)
         return {
             'key': base64.b64encode(key).decode(),
             'salt': base64.b64encode(salt).decode()
         }
     
     def verify_password(self, password, hashed_password, salt):
-        """Verify a password against its hash"""
+        """Verify a password against its hash, given as base64 strings or raw bytes"""
         if isinstance(salt, str):
             salt = base64.b64decode(salt)
+        if isinstance(hashed_password, str):
+            hashed_password = base64.b64decode(hashed_password)
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        
-        key = kdf.derive(password.encode())
-        expected_key = base64.b64decode(hashed_password)
+        key = _derive_key(password.encode(), salt)
         
-        return key == expected_key
\ No newline at end of file
+        # Constant-time comparison so the check does not leak how many bytes matched
+        return hmac.compare_digest(key, hashed_password)
\ No newline at end of file
@@ -1,7 +1,13 @@
-import hashlib
 import json
 import time
 import inspect
+from functools import lru_cache
+from ._hash import sha256
+
+@lru_cache(maxsize=256)
+def _compile_contract(code):
+    """Compile contract source once; redeploying the same template reuses the code object"""
+    return compile(code, f"<contract {sha256(code.encode()).hex()[:8]}>", "exec")
 
 class SmartContractEngine:
     def __init__(self, blockchain):
@@ -11,19 +17,17 @@ class SmartContractEngine:
     
     def deploy_contract(self, code, owner, init_params=None):
         # Generate a unique contract ID
-        contract_id = hashlib.sha256(f"{code}{owner}{time.time()}".encode()).hexdigest()[:16]
+        contract_id = sha256(f"{code}{owner}{time.time()}".encode()).hex()[:16]
         
         try:
             # Compile the contract code (in a real system, this would be more sophisticated)
             contract_namespace = {}
-            exec(code, contract_namespace)
+            exec(_compile_contract(code), contract_namespace)
             
             # Get the contract class - assuming the code defines a class that inherits from SmartContract
-            contract_class = None
-            for item in contract_namespace.values():
-                if inspect.isclass(item) and issubclass(item, SmartContract) and item != SmartContract:
-                    contract_class = item
-                    break
+            contract_class = next((item for item in contract_namespace.values()
+                                   if inspect.isclass(item) and issubclass(item, SmartContract) and item != SmartContract),
+                                  None)
             
             if not contract_class:
                 raise ValueError("No valid smart contract class found in code")
@@ -0,0 +1,137 @@
+import os
+import struct
+from . import codec
+from .blockchain import Blockchain
+from .utxo import UTXOSet
+
+# Every block record is a 4-byte big-endian length followed by the encoded block
+RECORD_HEADER = struct.Struct('>I')
+
+# Write buffer for saving, so records reach the OS in large chunks
+WRITE_BUFFER_SIZE = 1 << 20
+
+class BlockLogError(ValueError):
+    """The state file exists but its block log is missing or shorter than it says"""
+
+class ChainStore:
+    """Persist a blockchain as an append-only block log plus a small state file.
+    
+    Saving appends only the blocks added since the last load or save, then
+    rewrites the state (UTXO set, pending transactions, settings), which
+    records how many log blocks it covers. Records past that count, left by
+    an interrupted save, are ignored on load and overwritten on the next save.
+    """
+    
+    def __init__(self, state_file="blockchain.json", log_file="blockchain.log"):
+        self.state_file = os.fspath(state_file)
+        self.log_file = os.fspath(log_file)
+        self._persisted = 0  # Number of log blocks the state file covers
+        self._tip_hash = None  # Hash of the last of those blocks
+        self._log_size = 0  # Bytes of the log holding those blocks
+    
+    def _read_state(self):
+        with open(self.state_file, 'rb') as f:
+            return codec.loads(f.read())
+    
+    def _read_blocks(self, count):
+        """Read the first count block records, returning them and the bytes they span"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Not the same as nothing saved: the state still describes blocks
+            raise BlockLogError(f"Block log {self.log_file} is missing") from None
+        
+        blocks = []
+        offset = 0
+        while len(blocks) < count:
+            if offset + RECORD_HEADER.size > len(data):
+                raise BlockLogError("Block log is shorter than the saved state")
+            (length,) = RECORD_HEADER.unpack_from(data, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > len(data):
+                raise BlockLogError("Block log is shorter than the saved state")
+            blocks.append(codec.loads(data[offset:offset + length]))
+            offset += length
+        
+        return blocks, offset
+    
+    def load(self):
+        """Load the blockchain.
+        
+        Raises FileNotFoundError if nothing has been saved, and BlockLogError
+        if the state file was saved but its block log is missing or short.
+        """
+        data = self._read_state()
+        
+        if "chain" in data:
+            # Saved as a single file before the block log existed; the next
+            # save moves the blocks into the log
+            self._persisted, self._tip_hash, self._log_size = 0, None, 0
+            return Blockchain.from_dict(data, trusted=True)
+        
+        blocks, size = self._read_blocks(data["block_count"])
+        blockchain = Blockchain.from_dict({**data, "chain": blocks}, trusted=True)
+        
+        self._persisted = len(blocks)
+        self._tip_hash = blocks[-1]["hash"] if blocks else None
+        self._log_size = size
+        return blockchain
+    
+    def load_utxo_set(self):
+        """Load only the saved UTXO set, without reading the block log"""
+        data = self._read_state()
+        if "utxo_set" in data:
+            # The snapshot is only good with the blocks it was taken after
+            if "block_count" in data and not os.path.exists(self.log_file):
+                raise BlockLogError(f"Block log {self.log_file} is missing")
+            return UTXOSet.from_dict(data["utxo_set"])
+        
+        # Files saved before the snapshot existed start from the genesis UTXO
+        # set, the same as a full load of them
+        return Blockchain.from_dict(data).utxo_set
+    
+    def _write_records(self, f, blocks):
+        for block in blocks:
+            record = codec.dumps(block.to_dict())
+            f.write(RECORD_HEADER.pack(len(record)))
+            f.write(record)
+    
+    def save(self, blockchain):
+        chain = blockchain.chain
+        count = self._persisted
+        
+        if count and len(chain) >= count and chain[count - 1].hash == self._tip_hash:
+            # The saved blocks are still a prefix of the chain; append the rest
+            # after them, replacing anything an interrupted save left behind
+            with open(self.log_file, 'r+b', buffering=WRITE_BUFFER_SIZE) as f:
+                f.seek(self._log_size)
+                self._write_records(f, chain[count:])
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        else:
+            # First save, or the chain was replaced: write a fresh log and swap
+            # it in whole
+            temp_file = self.log_file + ".tmp"
+            with open(temp_file, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                self._write_records(f, chain)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(temp_file, self.log_file)
+        
+        # Point the state at the new blocks only once they are on disk
+        state = blockchain._state_dict()
+        state["block_count"] = len(chain)
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(codec.dumps(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.state_file)
+        
+        self._persisted = len(chain)
+        self._tip_hash = chain[-1].hash if chain else None
+        self._log_size = size
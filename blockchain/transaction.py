@@ -1,13 +1,14 @@
 import json
 import binascii
-import hashlib
 import time
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
+from ._hash import sha256
+from .wallet import sign_message, verify_signature
 
 class TransactionInput:
+    __slots__ = ('tx_id', 'output_index', 'signature')
+    
     def __init__(self, tx_id, output_index, signature=None):
         self.tx_id = tx_id
         self.output_index = output_index
@@ -28,6 +29,8 @@ class TransactionInput:
         return tx_input
 
 class TransactionOutput:
+    __slots__ = ('amount', 'recipient_address')
+    
     def __init__(self, amount, recipient_address):
         self.amount = amount
         self.recipient_address = recipient_address
@@ -43,6 +46,9 @@ class TransactionOutput:
         return cls(data["amount"], data["recipient_address"])
 
 class Transaction:
+    # Created by the thousand per block; slots drop the per-instance __dict__
+    __slots__ = ('id', 'inputs', 'outputs', 'timestamp', 'type', 'contract_data')
+    
     def __init__(self):
         self.id = None
         self.inputs = []
@@ -69,7 +75,26 @@ class Transaction:
             tx_dict["contract_data"] = self.contract_data
             
         tx_string = json.dumps(tx_dict, sort_keys=True).encode()
-        return hashlib.sha256(tx_string).hexdigest()
+        return sha256(tx_string).hex()
+    
+    def signature_hash(self):
+        """Hash everything an input signature commits to, leaving out the signatures themselves"""
+        tx_dict = {
+            "inputs": [[inp.tx_id, inp.output_index] for inp in self.inputs],
+            "outputs": [out.to_dict() for out in self.outputs],
+            "timestamp": self.timestamp,
+            "type": self.type
+        }
+        
+        if self.contract_data:
+            tx_dict["contract_data"] = self.contract_data
+        
+        return sha256(json.dumps(tx_dict, sort_keys=True).encode())
+    
+    @staticmethod
+    def _input_message(signature_hash, input_index, utxo_owner):
+        """The message signed for one input"""
+        return signature_hash + f"|{input_index}|{utxo_owner}".encode()
     
     def sign_input(self, input_index, private_key, utxo_set):
         # Get the UTXO being spent
@@ -79,26 +104,12 @@ class Transaction:
         if not utxo:
             return False
         
-        # Create a simplified version of the transaction for signing
-        # This prevents transaction malleability
-        tx_to_sign = {
-            "tx_id": self.calculate_hash(),
-            "input_index": input_index,
-            "utxo_owner": utxo.owner,
-            "outputs": [out.to_dict() for out in self.outputs]
-        }
-        
-        tx_string = json.dumps(tx_to_sign, sort_keys=True).encode()
+        # Sign the transaction content without any input signatures, so
+        # signing one input does not invalidate the others
+        tx_string = self._input_message(self.signature_hash(), input_index, utxo.owner)
         
         # Sign the transaction
-        signature = private_key.sign(
-            tx_string,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        signature = sign_message(private_key, tx_string)
         
         # Store the signature
         self.inputs[input_index].signature = signature
@@ -113,8 +124,13 @@ class Transaction:
         if not self.inputs or not self.outputs:
             return False
         
-        # Calculate the input amount
+        # Every input signs the same transaction hash, so serialize and hash
+        # the transaction once rather than once per input
+        signature_hash = self.signature_hash()
+        
+        # Calculate the input amount and collect the signatures to check
         input_amount = 0
+        signed_messages = []
         for i, tx_input in enumerate(self.inputs):
             # Get the UTXO being spent
             utxo = utxo_set.get_utxo(tx_input.tx_id, tx_input.output_index)
@@ -127,29 +143,9 @@ class Transaction:
             if not public_key:
                 return False
             
-            # Create the same transaction data that was signed
-            tx_to_verify = {
-                "tx_id": self.calculate_hash(),
-                "input_index": i,
-                "utxo_owner": utxo.owner,
-                "outputs": [out.to_dict() for out in self.outputs]
-            }
-            
-            tx_string = json.dumps(tx_to_verify, sort_keys=True).encode()
-            
-            # Verify the signature
-            try:
-                public_key.verify(
-                    tx_input.signature,
-                    tx_string,
-                    padding.PSS(
-                        mgf=padding.MGF1(hashes.SHA256()),
-                        salt_length=padding.PSS.MAX_LENGTH
-                    ),
-                    hashes.SHA256()
-                )
-            except Exception:
-                return False
+            # Create the same message that was signed
+            tx_string = self._input_message(signature_hash, i, utxo.owner)
+            signed_messages.append((public_key, tx_input.signature, tx_string))
             
             input_amount += utxo.amount
         
@@ -160,7 +156,9 @@ class Transaction:
         if input_amount < output_amount:
             return False
         
-        return True
+        # Verify the signatures last, once every cheap check has passed
+        return all(verify_signature(public_key, signature, message)
+                   for public_key, signature, message in signed_messages)
     
     def to_dict(self):
         if not self.id:
@@ -2,6 +2,8 @@ import hashlib
 import json
 
 class UTXO:
+    __slots__ = ('tx_id', 'output_index', 'amount', 'owner', 'is_spent')
+    
     def __init__(self, tx_id, output_index, amount, owner):
         self.tx_id = tx_id
         self.output_index = output_index
@@ -31,38 +33,77 @@ class UTXO:
 
 class UTXOSet:
     def __init__(self):
-        self.utxos = {}  # tx_id:output_index -> UTXO
+        self.utxos = {}  # (tx_id, output_index) -> UTXO
+        self.balances = {}  # owner -> sum of unspent amounts
+        self.by_owner = {}  # owner -> {(tx_id, output_index): UTXO} of unspent outputs
+    
+    def _adjust_balance(self, owner, amount):
+        self.balances[owner] = self.balances.get(owner, 0) + amount
+    
+    def _index_unspent(self, key, utxo):
+        self.by_owner.setdefault(utxo.owner, {})[key] = utxo
+        self._adjust_balance(utxo.owner, utxo.amount)
+    
+    def _unindex_unspent(self, key, utxo):
+        owned = self.by_owner.get(utxo.owner)
+        if owned is not None:
+            owned.pop(key, None)
+            if not owned:
+                # Drop the running sum with the last output rather than leave
+                # float rounding residue behind as a balance
+                del self.by_owner[utxo.owner]
+                self.balances.pop(utxo.owner, None)
+                return
+        self._adjust_balance(utxo.owner, -utxo.amount)
     
     def add_utxo(self, utxo):
-        key = f"{utxo.tx_id}:{utxo.output_index}"
+        key = (utxo.tx_id, utxo.output_index)
+        
+        # Replacing an existing entry must not count it twice
+        previous = self.utxos.get(key)
+        if previous and not previous.is_spent:
+            self._unindex_unspent(key, previous)
+        
         self.utxos[key] = utxo
+        if not utxo.is_spent:
+            self._index_unspent(key, utxo)
     
     def get_utxo(self, tx_id, output_index):
-        key = f"{tx_id}:{output_index}"
-        return self.utxos.get(key)
+        return self.utxos.get((tx_id, output_index))
     
     def spend_utxo(self, tx_id, output_index):
-        key = f"{tx_id}:{output_index}"
-        if key in self.utxos:
-            self.utxos[key].is_spent = True
-            return True
-        return False
+        # Spent outputs are dropped; their history lives in the blockchain.
+        # The flag is still set for callers holding a reference to the UTXO.
+        utxo = self.utxos.pop((tx_id, output_index), None)
+        if utxo is None:
+            return False
+        if not utxo.is_spent:
+            self._unindex_unspent((tx_id, output_index), utxo)
+        utxo.is_spent = True
+        return True
     
     def get_utxos_for_address(self, address):
-        return [utxo for utxo in self.utxos.values() 
-                if utxo.owner == address and not utxo.is_spent]
+        # Only the address's own unspent outputs are visited
+        return list(self.by_owner.get(address, {}).values())
     
     def get_balance(self, address):
-        utxos = self.get_utxos_for_address(address)
-        return sum(utxo.amount for utxo in utxos)
+        # Maintained incrementally by add_utxo/spend_utxo
+        return self.balances.get(address, 0)
     
     def to_dict(self):
-        return {key: utxo.to_dict() for key, utxo in self.utxos.items()}
+        # Serialized keys keep the "tx_id:output_index" string form
+        return {f"{tx_id}:{output_index}": utxo.to_dict()
+                for (tx_id, output_index), utxo in self.utxos.items()}
     
     @classmethod
     def from_dict(cls, data):
         utxo_set = cls()
-        for key, utxo_data in data.items():
+        for utxo_data in data.values():
+            # Older files kept spent outputs around; skip them on load
+            if utxo_data.get("is_spent"):
+                continue
             utxo = UTXO.from_dict(utxo_data)
+            key = (utxo.tx_id, utxo.output_index)
             utxo_set.utxos[key] = utxo
+            utxo_set._index_unspent(key, utxo)
         return utxo_set
\ No newline at end of file
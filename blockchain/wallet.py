@@ -1,84 +1,122 @@
-import hashlib
 import binascii
 import os
 import json
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ed25519
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
+from ._hash import sha256
+
+# Size of a raw Ed25519 private key, as stored in wallet files
+ED25519_SEED_SIZE = 32
+
+# Padding for signatures made by legacy RSA wallets
+_RSA_PSS = padding.PSS(
+    mgf=padding.MGF1(hashes.SHA256()),
+    salt_length=padding.PSS.MAX_LENGTH
+)
+
+def sign_message(private_key, message):
+    """Sign message bytes with an Ed25519 key, or RSA-PSS for legacy RSA keys"""
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return private_key.sign(message)
+    return private_key.sign(message, _RSA_PSS, hashes.SHA256())
+
+def verify_signature(public_key, signature, message):
+    """Check a signature made by sign_message"""
+    try:
+        if isinstance(public_key, ed25519.Ed25519PublicKey):
+            public_key.verify(signature, message)
+        else:
+            public_key.verify(signature, message, _RSA_PSS, hashes.SHA256())
+    except Exception:
+        return False
+    return True
+
+def encode_public_key(public_key):
+    """Serialize a public key in the form its address is derived from"""
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return public_key.public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+    
+    # Legacy RSA wallets keep the address derived from their PEM key
+    return public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+def public_key_address(public_key_bytes):
+    """Create a simple address by hashing the encoded public key"""
+    address_hash = sha256(public_key_bytes)
+    return binascii.hexlify(address_hash).decode('ascii')[:40]
 
 class Wallet:
     def __init__(self):
         self.private_key = None
         self.public_key = None
+        self.public_key_bytes = None
         self.address = None
         self.generate_keys()
     
     def generate_keys(self):
-        # Generate a new RSA key pair
-        self.private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
-        self.public_key = self.private_key.public_key()
-        
-        # Generate a wallet address from the public key
-        public_key_bytes = self.public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
+        # Generate a new Ed25519 key pair
+        self._set_private_key(ed25519.Ed25519PrivateKey.generate())
+    
+    def _set_private_key(self, private_key):
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
         
-        # Create a simple address by hashing the public key
-        address_hash = hashlib.sha256(public_key_bytes).digest()
-        self.address = binascii.hexlify(address_hash).decode('ascii')[:40]
+        # Encode the public key once and derive the wallet address from it
+        self.public_key_bytes = encode_public_key(self.public_key)
+        self.address = public_key_address(self.public_key_bytes)
     
     def sign_transaction(self, transaction):
         # Convert transaction to string and sign it
         transaction_str = json.dumps(transaction, sort_keys=True).encode()
         
-        signature = self.private_key.sign(
-            transaction_str,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        signature = sign_message(self.private_key, transaction_str)
         
         return binascii.hexlify(signature).decode('ascii')
     
     def save_to_file(self, filename):
-        # Serialize private key to save to file
-        pem = self.private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        )
+        if isinstance(self.private_key, ed25519.Ed25519PrivateKey):
+            # An Ed25519 key is fully described by its 32-byte seed
+            key_data = self.private_key.private_bytes(
+                encoding=serialization.Encoding.Raw,
+                format=serialization.PrivateFormat.Raw,
+                encryption_algorithm=serialization.NoEncryption()
+            )
+        else:
+            # Serialize private key to save to file
+            key_data = self.private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            )
         
         with open(filename, 'wb') as f:
-            f.write(pem)
+            f.write(key_data)
     
     @classmethod
     def load_from_file(cls, filename):
         with open(filename, 'rb') as f:
-            pem_data = f.read()
+            key_data = f.read()
         
         wallet = cls.__new__(cls)
-        wallet.private_key = serialization.load_pem_private_key(
-            pem_data,
-            password=None,
-            backend=default_backend()
-        )
-        wallet.public_key = wallet.private_key.public_key()
         
-        # Regenerate the address
-        public_key_bytes = wallet.public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        address_hash = hashlib.sha256(public_key_bytes).digest()
-        wallet.address = binascii.hexlify(address_hash).decode('ascii')[:40]
+        # Regenerate the public key and address; wallets saved before raw
+        # seeds were used hold a PEM key
+        if len(key_data) == ED25519_SEED_SIZE:
+            private_key = ed25519.Ed25519PrivateKey.from_private_bytes(key_data)
+        else:
+            private_key = serialization.load_pem_private_key(
+                key_data,
+                password=None,
+                backend=default_backend()
+            )
+        wallet._set_private_key(private_key)
         
-        return wallet
\ No newline at end of file
+        return wallet
@@ -1,7 +1,12 @@
 import argparse
-import os
+import sys
 import json
-from blockchain import Blockchain, Wallet, Transaction, P2PServer
+import signal
+import threading
+from blockchain import Blockchain, Wallet, Transaction, P2PServer, ChainStore, BlockLogError
+
+# Chain state in blockchain.json, blocks in the append-only blockchain.log
+chain_store = ChainStore()
 
 def create_wallet(args):
     wallet = Wallet()
@@ -11,8 +16,8 @@ def create_wallet(args):
     print(f"Private key saved to {wallet_file}")
 
 def get_balance(args):
-    blockchain = load_blockchain()
-    balance = blockchain.get_balance(args.address)
+    utxo_set = load_utxo_set()
+    balance = utxo_set.get_balance(args.address)
     print(f"Balance for {args.address}: {balance}")
 
 def send_transaction(args):
@@ -71,48 +76,76 @@ def start_node(args):
     server.start()
     
     if args.connect:
-        for peer in args.connect:
-            host, port = peer.split(':')
-            server.connect_to_peer(host, int(port))
+        server.connect_to_peers(peer.split(':') for peer in args.connect)
     
     print("Node started. Press Ctrl+C to stop.")
-    try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        server.stop()
-        save_blockchain(server.blockchain)
-        print("Node stopped. Blockchain saved.")
+    
+    # Park the main thread until Ctrl+C instead of spinning; the server runs
+    # on its own event loop thread
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    stop_event.wait()
+    
+    server.stop()
+    save_blockchain(server.blockchain)
+    print("Node stopped. Blockchain saved.")
 
 def show_blockchain(args):
     blockchain = load_blockchain()
     if args.json:
-        print(blockchain.to_json())
+        sys.stdout.buffer.write(blockchain.to_json_bytes() + b"\n")
     else:
-        print(f"Blockchain with {len(blockchain.chain)} blocks:")
+        # Format every block first and write once, rather than printing line by line
+        lines = [f"Blockchain with {len(blockchain.chain)} blocks:\n"]
         for i, block in enumerate(blockchain.chain):
-            print(f"Block #{i}: {block.hash}")
-            print(f"  Timestamp: {block.timestamp}")
-            print(f"  Transactions: {len(block.data.get('transactions', []))}")
-            print(f"  Nonce: {block.nonce}")
-            print()
+            lines.append(
+                f"Block #{i}: {block.hash}\n"
+                f"  Timestamp: {block.timestamp}\n"
+                f"  Transactions: {len(block.data.get('transactions', []))}\n"
+                f"  Nonce: {block.nonce}\n"
+                f"\n"
+            )
+        sys.stdout.write("".join(lines))
 
 def load_blockchain():
-    blockchain_file = "blockchain.json"
-    if os.path.exists(blockchain_file):
-        try:
-            with open(blockchain_file, 'r') as f:
-                return Blockchain.from_json(f.read())
-        except Exception as e:
-            print(f"Error loading blockchain: {e}")
-            return Blockchain()
-    return Blockchain()
+    try:
+        return chain_store.load()
+    except FileNotFoundError:
+        return Blockchain()
+    except BlockLogError as e:
+        # Starting over here would overwrite the saved state on the next save
+        print(f"Error loading blockchain: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error loading blockchain: {e}")
+        return Blockchain()
+
+def load_utxo_set():
+    """Load only the saved UTXO snapshot, skipping the work of rebuilding every block"""
+    try:
+        return chain_store.load_utxo_set()
+    except BlockLogError as e:
+        print(f"Error loading blockchain: {e}")
+        sys.exit(1)
+    except Exception:
+        # Missing or unreadable; load_blockchain reports it and falls back
+        return load_blockchain().utxo_set
 
 def save_blockchain(blockchain):
-    with open("blockchain.json", 'w') as f:
-        f.write(blockchain.to_json())
+    # Appends only the blocks added since the chain was loaded
+    chain_store.save(blockchain)
+
+# Subcommand name -> handler
+COMMANDS = {
+    "create-wallet": create_wallet,
+    "balance": get_balance,
+    "send": send_transaction,
+    "mine": mine_block,
+    "start-node": start_node,
+    "show": show_blockchain
+}
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="CIG Chain - A Simple Blockchain Implementation")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
     
@@ -145,22 +178,13 @@ def main():
     show_parser = subparsers.add_parser("show", help="Show the blockchain")
     show_parser.add_argument("--json", action="store_true", help="Output in JSON format")
     
-    args = parser.parse_args()
-    
-    if args.command == "create-wallet":
-        create_wallet(args)
-    elif args.command == "balance":
-        get_balance(args)
-    elif args.command == "send":
-        send_transaction(args)
-    elif args.command == "mine":
-        mine_block(args)
-    elif args.command == "start-node":
-        start_node(args)
-    elif args.command == "show":
-        show_blockchain(args)
-    else:
+    args = parser.parse_args(argv)
+    
+    command = COMMANDS.get(args.command)
+    if command is None:
         parser.print_help()
+    else:
+        command(args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
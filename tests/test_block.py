@@ -0,0 +1,113 @@
+import sys
+import os
+import time
+import json
+import hashlib
+
+# Add the parent directory to the path so we can import the blockchain modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain.block import Block, mine_batch, difficulty_target, BLOCK_VERSION, LEGACY_BLOCK_VERSION
+from blockchain._hash import _sha256
+
+def test_mine_block():
+    print("\n=== Testing Block Mining ===")
+    block = Block(1, "previous_hash", time.time(), {"data": "test"})
+
+    block.mine_block(3)
+    print(f"Block hash: {block.hash}")
+    print(f"Block nonce: {block.nonce}")
+
+    assert block.hash.startswith('000'), "Block hash should start with '000'"
+    assert block.hash == block.calculate_hash(), "Mined hash should match the recomputed hash"
+    print("✓ Mined hash is consistent with calculate_hash")
+
+def test_mine_block_blake2b():
+    print("\n=== Testing BLAKE2b Block Mining ===")
+    block = Block(1, "previous_hash", time.time(), {"data": "test"}, hash_alg="blake2b")
+    block.mine_block(3)
+    print(f"Block hash: {block.hash}")
+
+    assert len(block.hash) == 64, "BLAKE2b hashes should keep the SHA-256 length"
+    assert block.hash.startswith('000'), "Block hash should start with '000'"
+    assert Block.from_dict(block.to_dict()).verify_hash(), "Algorithm should survive serialization"
+    print("✓ BLAKE2b blocks mine and round-trip")
+
+def test_mine_block_parallel():
+    print("\n=== Testing Parallel Block Mining ===")
+    serial = Block(1, "previous_hash", 1700000000.0, {"data": "test"}).mine_block(3)
+    parallel = Block(1, "previous_hash", 1700000000.0, {"data": "test"}).mine_block(3, workers=2)
+
+    print(f"Serial nonce: {serial.nonce}, parallel nonce: {parallel.nonce}")
+    assert (parallel.nonce, parallel.hash) == (serial.nonce, serial.hash)
+    print("✓ Parallel mining finds the same nonce as serial mining")
+
+def test_mine_batch():
+    print("\n=== Testing Batched Nonce Search ===")
+    block = Block(1, "previous_hash", 1700000000.0, {"data": "test"})
+    midstate = _sha256(block._header_prefix())
+
+    nonce, block_hash = block.mine_block(2).nonce, block.hash
+
+    # A range ending right before the winning nonce finds nothing
+    assert mine_batch(midstate, 0, nonce, 2) is None
+
+    # A range starting at the winning nonce finds it immediately
+    assert mine_batch(midstate, nonce, 1, 2) == (nonce, block_hash)
+    print("✓ mine_batch finds the first winning nonce in range")
+
+def test_difficulty_target():
+    print("\n=== Testing Difficulty Target ===")
+    digest = bytes.fromhex("000f" + "ff" * 30)
+
+    assert digest < difficulty_target(3), "Three leading zero digits should meet difficulty 3"
+    assert not digest < difficulty_target(4), "Three leading zero digits should fail difficulty 4"
+    assert digest < difficulty_target(0), "Any digest should meet difficulty 0"
+
+    block = Block(1, "previous_hash", time.time(), {"data": "test"})
+    block.hash = digest.hex()
+    assert block.meets_difficulty(3) and not block.meets_difficulty(4)
+    print("✓ Raw digest comparison matches the hex prefix rule")
+
+def test_merkle_root():
+    print("\n=== Testing Merkle Root ===")
+    transactions = [{"id": 1}, {"id": 2}, {"id": 3}]
+    block = Block(1, "previous_hash", time.time(), {"transactions": transactions})
+
+    # Odd layers duplicate their last hash
+    leaves = [hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).digest() for tx in transactions]
+    left = hashlib.sha256(leaves[0] + leaves[1]).digest()
+    right = hashlib.sha256(leaves[2] + leaves[2]).digest()
+    expected = hashlib.sha256(left + right).hexdigest()
+
+    print(f"Merkle root: {block.merkle_root}")
+    assert block.merkle_root == expected
+    print("✓ Merkle root matches a manually built tree")
+
+def test_data_reassignment():
+    print("\n=== Testing Block Data Reassignment ===")
+    block = Block(1, "previous_hash", time.time(), {"transactions": [{"id": 1}]})
+    original_hash, original_root = block.hash, block.merkle_root
+
+    block.data = {"transactions": [{"id": 2}]}
+    assert block.merkle_root != original_root, "Reassigned transactions should get a new Merkle root"
+    assert block.calculate_hash() != original_hash, "The header should commit to the new data"
+    assert not block.verify_hash(), "The stored hash should no longer verify"
+    print("✓ Reassigning data changes the block hash")
+
+def test_legacy_block_hash():
+    print("\n=== Testing Legacy Block Hashes ===")
+    fields = {"index": 1, "previous_hash": "0", "timestamp": 1700000000.0,
+              "data": {"transactions": [{"id": 1}]}, "nonce": 7}
+    legacy_hash = hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+    # Blocks saved before the binary header carry no version
+    block = Block.from_dict({**fields, "hash": legacy_hash})
+    assert block.version == LEGACY_BLOCK_VERSION
+    assert block.verify_hash(), "Legacy blocks should verify with the JSON header hash"
+    assert Block.from_dict(block.to_dict()).verify_hash(), "The version should survive serialization"
+    print("✓ Blocks without a version verify against their JSON hash")
+
+    block.mine_block(1)
+    assert block.version == BLOCK_VERSION and block.verify_hash()
+    print("✓ Mining upgrades a block to the binary header")
@@ -0,0 +1,88 @@
+import sys
+import os
+
+# Add the parent directory to the path so we can import the blockchain modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain.blockchain import Blockchain
+from blockchain.storage import ChainStore
+from blockchain import codec
+
+def test_blockchain_serialization():
+    print("\n=== Testing Blockchain Serialization ===")
+    blockchain = Blockchain(difficulty=1)
+    blockchain.mine_pending_transactions("miner")
+
+    data = blockchain.to_json()
+    print(f"Serialized {len(blockchain.chain)} blocks into {len(data)} characters")
+
+    restored = Blockchain.from_json(data)
+    assert [block.hash for block in restored.chain] == [block.hash for block in blockchain.chain]
+    assert restored.is_chain_valid()
+    assert restored.get_balance("miner") == blockchain.get_balance("miner")
+    print("✓ Chain and balances survive a JSON round trip")
+
+    # A peer's UTXO snapshot is not trusted; balances come from replaying blocks
+    forged = blockchain.to_dict()
+    forged["utxo_set"] = {"forged:0": {"tx_id": "forged", "output_index": 0, "amount": 10**9,
+                                       "owner": "attacker", "is_spent": False}}
+    received = Blockchain.from_dict(forged)
+    assert received.is_chain_valid()
+    assert received.get_balance("attacker") == 0
+    assert received.get_balance("miner") == blockchain.get_balance("miner")
+    print("✓ Received chains replay their transactions")
+
+def test_tampered_chain():
+    print("\n=== Testing Tampered Chain Detection ===")
+    blockchain = Blockchain(difficulty=1)
+    blockchain.mine_pending_transactions("miner")
+    blockchain.mine_pending_transactions("miner")
+
+    blockchain.chain[2].timestamp = 0
+    assert not blockchain.is_chain_valid(), "A changed header field should invalidate the chain"
+    print("✓ Header changes are detected")
+
+    # Blocks changed after a successful validation are checked again
+    blockchain = Blockchain(difficulty=1)
+    blockchain.mine_pending_transactions("miner")
+    blockchain.mine_pending_transactions("miner")
+    assert blockchain.is_chain_valid()
+    blockchain.chain[1].data = {"transactions": []}
+    assert not blockchain.is_chain_valid(), "The validated prefix should not hide changes"
+    print("✓ Changes behind the validation cursor are detected")
+
+    blockchain = Blockchain(difficulty=1)
+    blockchain.mine_pending_transactions("miner")
+    blockchain.chain[1].data["transactions"][0]["outputs"][0]["amount"] = 10**6
+    assert not blockchain.is_chain_valid(), "Data edited in place should invalidate the chain"
+    print("✓ In-place data edits are detected")
+
+def test_chain_store(tmp_path):
+    print("\n=== Testing Append-Only Chain Storage ===")
+    store = ChainStore(tmp_path / "blockchain.json", tmp_path / "blockchain.log")
+    blockchain = Blockchain(difficulty=1)
+    store.save(blockchain)
+    first_log = (tmp_path / "blockchain.log").read_bytes()
+
+    blockchain.mine_pending_transactions("miner")
+    store.save(blockchain)
+    log = (tmp_path / "blockchain.log").read_bytes()
+    assert log.startswith(first_log), "Saving should only append the new block"
+    print(f"Log grew from {len(first_log)} to {len(log)} bytes")
+
+    # Bytes left by an interrupted append are ignored on load
+    with open(tmp_path / "blockchain.log", "ab") as f:
+        f.write(b"\x00\x00\x01")
+    reader = ChainStore(tmp_path / "blockchain.json", tmp_path / "blockchain.log")
+    restored = reader.load()
+    assert [block.hash for block in restored.chain] == [block.hash for block in blockchain.chain]
+    assert restored.get_balance("miner") == blockchain.get_balance("miner")
+    assert reader.load_utxo_set().balances == blockchain.utxo_set.balances
+    print("✓ Chain reloads from the log, ignoring a torn tail")
+
+    # Chains saved as a single file are moved into the log on the next save
+    (tmp_path / "blockchain.json").write_bytes(codec.dumps(blockchain.to_dict()))
+    migrated = reader.load()
+    reader.save(migrated)
+    assert [block.hash for block in reader.load().chain] == [block.hash for block in blockchain.chain]
+    print("✓ Single-file chains migrate to the log")
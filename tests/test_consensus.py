@@ -27,8 +27,9 @@ def test_proof_of_work():
     print("\n=== Testing Proof of Work ===")
     pow_consensus = ProofOfWork()
     
-    # Create a test block
-    block = Block(1, "previous_hash", time.time(), {"data": "test"})
+    # Create a test block; a fixed timestamp keeps the nonce search, and so
+    # the test's run time, the same on every run
+    block = Block(1, "previous_hash", 1700000000.0, {"data": "test"})
     
     # Mine the block
     print(f"Mining block with difficulty 3...")
@@ -42,6 +43,7 @@ def test_proof_of_work():
     
     # Verify the block meets the difficulty requirement
     assert block.hash.startswith('000'), "Block hash should start with '000'"
+    assert block.meets_difficulty(3) and block.hash == block.calculate_hash()
     print("✓ Block hash meets difficulty requirement")
 
 def test_proof_of_stake():
@@ -65,11 +67,14 @@ def test_proof_of_stake():
     print("\nSelecting validators:")
     validator_counts = {addr: 0 for addr in validators}
     
-    for i in range(100):
-        next_validator = pos_consensus.get_next_validator()
+    # Draw all 100 rounds at once from the cached stake table
+    selected = pos_consensus.get_next_validators(100, entropy=0)
+    assert selected == pos_consensus.get_next_validators(100, entropy=0), "Selection should be reproducible"
+    for next_validator in selected:
         validator_counts[next_validator] += 1
-        # Add a small delay to change the time factor
-        time.sleep(0.01)
+    
+    assert len(selected) == 100 and set(selected) <= set(validators)
+    assert pos_consensus.get_next_validator() in validators
     
     print("Validator selection distribution over 100 rounds:")
     for validator, count in validator_counts.items():
@@ -78,7 +83,6 @@ def test_proof_of_stake():
     
     # Test block validation
     block = Block(1, "previous_hash", time.time(), {"data": "test"})
-    block.hash = block.calculate_hash()
     
     # Valid validator
     valid = pos_consensus.validate_block(block, "validator1")
@@ -96,15 +100,21 @@ def test_delegated_proof_of_stake():
     # Create some delegates
     delegates = ["delegate1", "delegate2", "delegate3", "delegate4", "delegate5"]
     
-    # Vote for delegates with different weights
+    # Vote for delegates with different weights, recorded as one batch
     print("Voting for delegates:")
-    for i, delegate in enumerate(delegates):
-        # Different voters vote with different weights
-        for j in range(5):
-            voter = f"voter{j}"
-            weight = random.randint(1, 10) * (i + 1)
-            dpos_consensus.vote(voter, delegate, weight)
-            print(f"{voter} voted for {delegate} with weight {weight}")
+    rng = random.Random(0)
+    votes = [(f"voter{j}", delegate, rng.randint(1, 10) * (i + 1))
+             for i, delegate in enumerate(delegates) for j in range(5)]
+    for voter, delegate, weight in votes:
+        print(f"{voter} voted for {delegate} with weight {weight}")
+    dpos_consensus.vote_batch(votes)
+    
+    # A batch tallies the same as voting one at a time
+    one_at_a_time = DelegatedProofOfStake(blockchain)
+    for vote in votes:
+        one_at_a_time.vote(*vote)
+    assert dpos_consensus.delegates == one_at_a_time.delegates
+    assert dpos_consensus.active_delegates == one_at_a_time.active_delegates
     
     print("\nActive delegates:")
     for delegate in dpos_consensus.active_delegates:
@@ -118,7 +128,6 @@ def test_delegated_proof_of_stake():
     
     # Test block validation
     block = Block(1, "previous_hash", time.time(), {"data": "test"})
-    block.hash = block.calculate_hash()
     
     # Valid delegate
     if dpos_consensus.active_delegates:
@@ -145,7 +154,6 @@ def test_pbft():
     
     # Create a test block
     block = Block(1, "previous_hash", time.time(), {"data": "test"})
-    block.hash = block.calculate_hash()
     
     # Test pre-prepare phase
     success, message = pbft_consensus.pre_prepare(block, pbft_consensus.primary)
@@ -154,17 +162,24 @@ def test_pbft():
     success, message = pbft_consensus.pre_prepare(block, "validator2")
     print(f"Pre-prepare by non-primary: {success} - {message}")
     
+    # Committing before the block is prepared fails
+    success, message = pbft_consensus.commit(block.hash, "validator1")
+    assert (success, message) == (False, "Not prepared yet")
+    
     # Test prepare phase
     print("\nPrepare phase:")
-    for validator in validators:
-        success, message = pbft_consensus.prepare(block.hash, validator)
+    results = pbft_consensus.prepare_batch(block.hash, validators)
+    for validator, (success, message) in results.items():
         print(f"Prepare by {validator}: {success} - {message}")
+    assert results["validator4"] == (True, "Prepare recorded")
+    assert results["validator5"] == (True, "Prepared"), "Five of seven validators is the 2f+1 quorum"
     
     # Test commit phase
     print("\nCommit phase:")
-    for validator in validators:
-        success, message = pbft_consensus.commit(block.hash, validator)
+    results = pbft_consensus.commit_batch(block.hash, validators + ["outsider"])
+    for validator, (success, message) in results.items():
         print(f"Commit by {validator}: {success} - {message}")
+    assert results["outsider"] == (False, "Not a validator")
     
     # Check if block is committed
     is_committed = pbft_consensus.is_committed(block.hash)
@@ -176,6 +191,31 @@ def test_pbft():
     pbft_consensus.change_view()
     print(f"Primary changed from {old_primary} to {pbft_consensus.primary}")
 
+def test_pbft_batches_match_sequential():
+    print("\n=== Testing PBFT Batches Against Sequential Votes ===")
+    votes = ["validator1", "outsider", "validator2", "validator2", "validator3",
+             "validator4", "validator5", "outsider", "validator6"]
+    
+    for validator_count in (0, 7):
+        batched = PracticalByzantineFaultTolerance(MockBlockchain())
+        sequential = PracticalByzantineFaultTolerance(MockBlockchain())
+        for i in range(validator_count):
+            batched.add_validator(f"validator{i + 1}")
+            sequential.add_validator(f"validator{i + 1}")
+        
+        for batch, single in ((batched.prepare_batch, sequential.prepare),
+                              (batched.commit_batch, sequential.commit)):
+            results = batch("block", votes)
+            expected = {}
+            for address in votes:
+                expected[address] = single("block", address)
+            assert results == expected
+        
+        assert batched.prepared_messages == sequential.prepared_messages
+        assert batched.committed_messages == sequential.committed_messages
+        assert batched.is_committed("block") == sequential.is_committed("block")
+        print(f"✓ Batches match sequential votes with {validator_count} validators")
+
 def test_proof_of_authority():
     print("\n=== Testing Proof of Authority ===")
     blockchain = MockBlockchain()
@@ -200,11 +240,11 @@ def test_proof_of_authority():
             print(f"Round {i+1}: {next_authority}")
         else:
             print(f"Round {i+1}: None (waiting for block time)")
-        time.sleep(0.15)  # Wait longer than block time
+        # Simulate waiting longer than the block time
+        poa_consensus.last_block_time -= 0.15
     
     # Test block validation
     block = Block(1, "previous_hash", time.time(), {"data": "test"})
-    block.hash = block.calculate_hash()
     
     # Valid authority
     valid = poa_consensus.validate_block(block, "authority1")
@@ -232,15 +272,18 @@ def test_proof_of_burn():
     print("\nValidator selection based on burned coins:")
     validator_counts = {addr: 0 for addr in addresses}
     
-    for i in range(100):
-        next_validator = pob_consensus.get_next_validator()
+    # Draw all 100 rounds at once from the cached burn table
+    selected = pob_consensus.get_next_validators(100, entropy=42)
+    for next_validator in selected:
         validator_counts[next_validator] += 1
-        # Add a small delay to change the time factor
-        time.sleep(0.01)
+    
+    assert selected == pob_consensus.get_next_validators(100, entropy=42), "Selection should be reproducible"
+    assert pob_consensus.get_next_validator(entropy=7) == pob_consensus.get_next_validator(entropy=7)
+    assert sum(validator_counts.values()) == 100
     
     print("Validator selection distribution over 100 rounds:")
     for validator, count in validator_counts.items():
-        burn_amount = pob_consensus.burn_addresses[validator]
+        burn_amount = pob_consensus.get_burned(validator)
         print(f"{validator} (burned: {burn_amount:.2f}): selected {count} times")
     
     # Test decay over time
@@ -273,8 +316,9 @@ def test_hybrid_consensus():
         result = hybrid_consensus.register_validator(address, stake)
         print(f"Registered {address} with stake {stake}: {result}")
     
-    # Create a test block
-    block = Block(1, "previous_hash", time.time(), {"data": "test"})
+    # Create a test block; a fixed timestamp keeps the nonce search, and so
+    # the test's run time, the same on every run
+    block = Block(1, "previous_hash", 1700000000.0, {"data": "test"})
     
     # Get a validator
     validator = hybrid_consensus.get_next_validator()
@@ -344,7 +388,6 @@ def test_sharding_consensus():
     
     # Test block validation
     block = Block(1, "previous_hash", time.time(), {"data": "test"})
-    block.hash = block.calculate_hash()
     
     print("\nBlock validation:")
     for validator, shard_id in sharding_consensus.validator_to_shard.items():
@@ -364,18 +407,9 @@ def test_sharding_consensus():
         # Only test one validator for brevity
         break
 
-if __name__ == "__main__":
-    # Create tests directory if it doesn't exist
-    os.makedirs(os.path.dirname(os.path.abspath(__file__)), exist_ok=True)
-    
-    # Run all tests
-    test_proof_of_work()
-    test_proof_of_stake()
-    test_delegated_proof_of_stake()
-    test_pbft()
-    test_proof_of_authority()
-    test_proof_of_burn()
-    test_hybrid_consensus()
-    test_sharding_consensus()
-    
-    print("\nAll consensus tests completed!")
\ No newline at end of file
+    # Test batch validation across shards
+    entries = [(block, validator, shard_id) for validator, shard_id in sharding_consensus.validator_to_shard.items()]
+    results = sharding_consensus.validate_blocks(entries + [(block, "unknown_validator", 0)])
+    print(f"\nBatch validation: {results}")
+    assert all(success for success, _ in results[:-1]), "Every validator should validate in its own shard"
+    assert results[-1] == (False, "Validator not registered")
@@ -0,0 +1,89 @@
+import sys
+import os
+import time
+
+# Add the parent directory to the path so we can import the blockchain modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain.security import SecurityManager, _fernet_cache, _take
+from blockchain.block import Block
+from cryptography.fernet import InvalidToken
+
+def test_merkle_proof():
+    print("\n=== Testing Merkle Proofs ===")
+    security = SecurityManager()
+    transactions = [{"id": i, "amount": i * 10} for i in range(5)]
+
+    root = security.calculate_merkle_root(transactions)
+    block = Block(1, "previous_hash", time.time(), {"transactions": transactions})
+    print(f"Merkle root: {root}")
+    assert root == block.merkle_root, "SecurityManager and Block should agree on the root"
+
+    leaf = security.calculate_merkle_root(transactions[3:4])
+    proof = security.generate_merkle_proof(leaf, transactions)
+    print(f"Proof for transaction 3: {proof}")
+    assert security.verify_merkle_proof(leaf, proof, root)
+    assert not security.verify_merkle_proof(leaf, proof[:-1], root)
+    assert security.generate_merkle_proof("00" * 32, transactions) is None
+
+    # The tree is cached, so a proof can be requested by root alone
+    assert security.generate_merkle_proof_for_root(leaf, root) == proof
+    print("✓ Proofs verify against the Merkle root")
+
+    # Precomputed raw digests skip re-serializing the transactions
+    digests = [bytes.fromhex(security.calculate_merkle_root([tx])) for tx in transactions]
+    assert security.calculate_merkle_root(digests) == root
+    print("✓ Raw leaf digests give the same root")
+
+def test_password_hashing():
+    print("\n=== Testing Password Hashing ===")
+    security = SecurityManager()
+
+    hashed = security.hash_password("correct horse")
+    print(f"Password hash: {hashed}")
+    assert security.verify_password("correct horse", hashed['key'], hashed['salt'])
+    assert not security.verify_password("wrong horse", hashed['key'], hashed['salt'])
+    print("✓ Only the original password verifies")
+
+    key, salt = security.hash_password_raw("correct horse")
+    assert len(key) == 32 and len(salt) == 16
+    assert security.verify_password("correct horse", key, salt)
+    assert salt != security.hash_password_raw("correct horse")[1], "Each hash should get a fresh salt"
+    print("✓ Raw hashes verify without base64")
+
+    encrypted = security.encrypt_data({"amount": 10}, "passphrase")
+    assert security.decrypt_data(encrypted, "passphrase") == {"amount": 10}
+    print("✓ Encrypted data round-trips with the same passphrase")
+
+    salt = security.generate_secure_random(16)
+    encrypted = security.encrypt_data({"amount": 10}, "passphrase", salt)
+    assert security.decrypt_data(encrypted, "passphrase", salt) == {"amount": 10}
+    try:
+        security.decrypt_data(encrypted, "passphrase")
+        assert False, "A different salt should derive a different key"
+    except InvalidToken:
+        pass
+    print("✓ Caller-supplied salts derive their own keys")
+
+    assert all(b"passphrase" not in digest for digest in _fernet_cache), "The cache should not keep passphrases"
+    print("✓ Derived keys are cached by digest, not by passphrase")
+
+def test_random_pool_after_fork():
+    print("\n=== Testing Salt Randomness Across Fork ===")
+    if not hasattr(os, "fork"):
+        return
+
+    _take(16)  # Fill the pool before forking
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_end, _take(16))
+        os._exit(0)
+
+    os.waitpid(pid, 0)
+    child_salt = os.read(read_end, 16)
+    os.close(read_end)
+    os.close(write_end)
+
+    assert child_salt != _take(16), "A forked child should not reuse the parent's pooled bytes"
+    print("✓ Forked processes draw their own salts")
@@ -0,0 +1,69 @@
+import sys
+import os
+
+# Add the parent directory to the path so we can import the blockchain modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import serialization
+from blockchain.wallet import Wallet
+from blockchain.transaction import Transaction
+from blockchain.utxo import UTXO, UTXOSet
+
+def test_signed_transaction():
+    print("\n=== Testing Transaction Signatures ===")
+    wallet = Wallet()
+    utxo_set = UTXOSet()
+    utxo_set.add_utxo(UTXO("funding_tx_1", 0, 5, wallet.address))
+    utxo_set.add_utxo(UTXO("funding_tx_2", 0, 5, wallet.address))
+
+    tx = Transaction()
+    tx.add_input("funding_tx_1", 0)
+    tx.add_input("funding_tx_2", 0)
+    tx.add_output(10, "recipient")
+    for i in range(len(tx.inputs)):
+        assert tx.sign_input(i, wallet.private_key, utxo_set)
+
+    # Signing the second input must not invalidate the first
+    assert tx.is_valid(utxo_set, lambda address: wallet.public_key)
+    print("✓ Both input signatures verify")
+
+    assert not tx.is_valid(utxo_set, lambda address: Wallet().public_key)
+    print("✓ Signatures do not verify under another key")
+
+    tx.outputs[0].amount = 9
+    assert not tx.is_valid(utxo_set, lambda address: wallet.public_key)
+    print("✓ Changing an output invalidates the signatures")
+
+def test_wallet_file(tmp_path):
+    print("\n=== Testing Wallet Files ===")
+    wallet = Wallet()
+    wallet_file = tmp_path / "wallet.dat"
+    wallet.save_to_file(wallet_file)
+
+    assert wallet_file.stat().st_size == 32, "Ed25519 wallets should store only the key seed"
+    assert Wallet.load_from_file(wallet_file).address == wallet.address
+    print("✓ Raw seed wallets reload with the same address")
+
+    # Wallets written as PEM before raw seeds still load
+    pem = wallet.private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    wallet_file.write_bytes(pem)
+    assert Wallet.load_from_file(wallet_file).address == wallet.address
+    print("✓ PEM wallets still load")
+
+def test_utxo_balances():
+    print("\n=== Testing UTXO Balances ===")
+    utxo_set = UTXOSet()
+    utxo_set.add_utxo(UTXO("tx_1", 0, 0.1, "alice"))
+    utxo_set.add_utxo(UTXO("tx_2", 0, 0.2, "alice"))
+    assert abs(utxo_set.get_balance("alice") - 0.3) < 1e-9
+
+    utxo_set.spend_utxo("tx_1", 0)
+    assert abs(utxo_set.get_balance("alice") - 0.2) < 1e-9
+    utxo_set.spend_utxo("tx_2", 0)
+    assert utxo_set.get_balance("alice") == 0, "No rounding residue once every output is spent"
+    assert "alice" not in utxo_set.balances
+    print("✓ Fractional balances return to exactly zero")